@@ -1,6 +1,6 @@
 import os
 from dotenv import load_dotenv
-import requests
+from http_client import riot_session
 
 # Load environment variables
 load_dotenv()
@@ -12,8 +12,9 @@ REGION = "americas"  # Use "americas", "asia", or "europe" for the account endpo
 
 def convert_puuid_to_riotid(puuid) -> str:     # (e.g. "iqclScuTpL1qEaHBL6o-VxUmtH-YHr97lIOvGIeP8j8QCnnBwv5CEwrUrKruD60evV-bBuEkq4H72w")
     # Make the request to get Riot ID (gameName and tagLine)
-    response = requests.get(
+    response = riot_session.get(
         f"https://{REGION}.api.riotgames.com/riot/account/v1/accounts/by-puuid/{puuid}",
+        "account",
         headers=HEADERS
     )
 
@@ -30,8 +31,9 @@ def convert_puuid_to_riotid(puuid) -> str:     # (e.g. "iqclScuTpL1qEaHBL6o-VxUm
     
 def convert_riotid_to_puuid(gameName, tagLine) -> str:     # (e.g. Ballas, 5555)
     # Make the request to get PUUID
-    response = requests.get(
-        f"https://{REGION}.api.riotgames.com/riot/account/v1/accounts/by-riot-id/{gameName}/{tagLine}",  
+    response = riot_session.get(
+        f"https://{REGION}.api.riotgames.com/riot/account/v1/accounts/by-riot-id/{gameName}/{tagLine}",
+        "account",
         headers=HEADERS
     )
 
@@ -1,15 +1,15 @@
-import requests
 import time
 from config import REGION, HEADERS, MATCHES_PER_PUUID, RANKED_SOLO_DUO_QUEUE_ID
+from http_client import riot_session
 
 class RateLimitExceeded(Exception):
     """Custom exception for persistent rate limit issues."""
     pass
 
-def api_request(url, headers=HEADERS, params=None, retries=3):
+def api_request(url, headers=HEADERS, params=None, retries=3, endpoint=None):
     """Generic API request handler with rate limit retry logic."""
     for attempt in range(retries):
-        response = requests.get(url, headers=headers, params=params)
+        response = riot_session.get(url, endpoint, headers=headers, params=params)
         if response.status_code == 200:
             return response.json()
         elif response.status_code == 429:  # Rate limit exceeded
@@ -22,20 +22,23 @@ def api_request(url, headers=HEADERS, params=None, retries=3):
     raise RateLimitExceeded(f"Rate limit exceeded after {retries} retries")
 
 def get_match_ids(puuid, count=MATCHES_PER_PUUID):
-    """Get match IDs for a PUUID with rate limit handling."""
+    """Get match IDs for a PUUID with rate limit handling.
+
+    Returns None if the list could not be fetched, so callers can tell a failure from an empty history.
+    """
     url = f"https://{REGION}.api.riotgames.com/lol/match/v5/matches/by-puuid/{puuid}/ids"
     params = {"queue": RANKED_SOLO_DUO_QUEUE_ID, "count": count}
     try:
-        return api_request(url, params=params)
+        return api_request(url, params=params, endpoint="match_ids")
     except RateLimitExceeded as e:
         print(e)
-        return []
+        return None
 
 def get_match_details(match_id):
     """Get match details for a match ID with rate limit handling."""
     url = f"https://{REGION}.api.riotgames.com/lol/match/v5/matches/{match_id}"
     try:
-        return api_request(url)
+        return api_request(url, endpoint="match")
     except RateLimitExceeded as e:
         print(e)
         return None
@@ -94,7 +97,9 @@ def extract_player_data(match_data, match_id):
                 'summoner1Id': participant['summoner1Id'],
                 'summoner2Id': participant['summoner2Id']
             }),
-            'team_bans': str(team_bans[participant['teamId']])
+            'team_bans': str(team_bans[participant['teamId']]),
+            'game_version': match_data['info'].get('gameVersion'),
+            'game_creation': match_data['info'].get('gameCreation')
         })
     
     return player_data
\ No newline at end of file
@@ -0,0 +1,351 @@
+import argparse
+import asyncio
+import time
+from collections import deque
+import httpx
+from api import RateLimitExceeded
+from extract_data import process_match_details
+from database import setup_database, load_existing_match_ids, MatchWriter
+from match_archive import MatchArchive
+from crawl_frontier import CrawlFrontier
+from metrics import metrics
+from config import (REGION, HEADERS, MAX_MATCHES, MATCHES_PER_PUUID, RANKED_SOLO_DUO_QUEUE_ID,
+                    CRAWLER_CONCURRENCY, DEFAULT_APP_RATE_LIMIT, DB_PATH, ARCHIVE_PATH,
+                    CRAWLER_STATS_PATH, CRAWLER_STATS_INTERVAL_SECONDS)
+
+WINDOW_MARGIN_SECONDS = 0.1  # Slack for network jitter between our send time and Riot's receive time
+SHUTDOWN_TIMEOUT_SECONDS = 10.0
+
+def parse_rate_limit(header):
+    """Parse a Riot rate limit header such as '20:1,100:120' into [(count, seconds), ...]."""
+    return [tuple(int(value) for value in window.split(':')) for window in header.split(',') if window]
+
+class TokenBucket:
+    """Bucket of `count` tokens where every spent token comes back `seconds` after it was taken.
+
+    Unlike a constant-rate refill this never admits more than `count` requests in any window of
+    `seconds`, which is how Riot counts them.
+    """
+    def __init__(self, count, seconds, spent=None):
+        self.count = count
+        self.seconds = seconds
+        self.window = seconds + WINDOW_MARGIN_SECONDS
+        self._spent = spent if spent is not None else deque()  # return times, ascending
+
+    def wait_time(self, now):
+        while self._spent and self._spent[0] <= now:
+            self._spent.popleft()
+        if len(self._spent) < self.count:
+            return 0.0
+        return self._spent[len(self._spent) - self.count] - now
+
+    def take(self, now):
+        self._spent.append(now + self.window)
+
+    def sync(self, used, now):
+        """Account for requests the server counted in this window that we did not (e.g. other clients)."""
+        self.wait_time(now)
+        for _ in range(used - len(self._spent)):
+            self._spent.append(now + self.window)
+
+class RateLimiter:
+    """Proactive limiter for Riot's application-wide and per-method rate limits.
+
+    Starts from DEFAULT_APP_RATE_LIMIT and adopts the limits and current counts reported in the
+    X-App-Rate-Limit(-Count) and X-Method-Rate-Limit(-Count) headers of every response.
+    """
+    def __init__(self, app_limit=DEFAULT_APP_RATE_LIMIT):
+        self.app_limit = app_limit
+        self.app_buckets = self._buckets(app_limit, [])
+        self.method_limits = {}
+        self.method_buckets = {}
+        self._locks = {}
+        self._paused_until = 0.0
+
+    @staticmethod
+    def _buckets(header, previous):
+        """Build buckets for a limit header, keeping the spent tokens of windows that still exist."""
+        spent = {bucket.seconds: bucket._spent for bucket in previous}
+        return [TokenBucket(count, seconds, spent.get(seconds)) for count, seconds in parse_rate_limit(header)]
+
+    @staticmethod
+    def _sync(buckets, header, now):
+        used = dict((seconds, count) for count, seconds in parse_rate_limit(header))
+        for bucket in buckets:
+            bucket.sync(used.get(bucket.seconds, 0), now)
+
+    async def acquire(self, method):
+        """Wait until both the app and the method limits have a token, then take one from each."""
+        lock = self._locks.setdefault(method, asyncio.Lock())
+        async with lock:  # FIFO per method without blocking other methods
+            while True:
+                now = time.monotonic()
+                buckets = self.app_buckets + self.method_buckets.get(method, [])
+                wait = max([self._paused_until - now] + [bucket.wait_time(now) for bucket in buckets])
+                if wait <= 0:
+                    for bucket in buckets:
+                        bucket.take(now)
+                    return
+                await asyncio.sleep(wait)
+
+    def update(self, method, headers):
+        """Adopt limits and counts from a response's rate limit headers."""
+        now = time.monotonic()
+        app_limit = headers.get('X-App-Rate-Limit')
+        if app_limit and app_limit != self.app_limit:
+            self.app_limit = app_limit
+            self.app_buckets = self._buckets(app_limit, self.app_buckets)
+        if 'X-App-Rate-Limit-Count' in headers:
+            self._sync(self.app_buckets, headers['X-App-Rate-Limit-Count'], now)
+
+        method_limit = headers.get('X-Method-Rate-Limit')
+        if method_limit and method_limit != self.method_limits.get(method):
+            self.method_limits[method] = method_limit
+            self.method_buckets[method] = self._buckets(method_limit, self.method_buckets.get(method, []))
+        if 'X-Method-Rate-Limit-Count' in headers:
+            self._sync(self.method_buckets.get(method, []), headers['X-Method-Rate-Limit-Count'], now)
+
+    def pause(self, seconds):
+        """Stop issuing requests for `seconds` (after a 429)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+class AsyncRiotClient:
+    """Pooled asyncio client for the Riot API that rate-limits itself before sending."""
+    def __init__(self, base_url=f"https://{REGION}.api.riotgames.com", headers=HEADERS,
+                 concurrency=CRAWLER_CONCURRENCY, limiter=None, retries=3, timeout=10.0):
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={key: value for key, value in headers.items() if value is not None},
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        )
+        self.limiter = limiter or RateLimiter()
+        self.retries = retries
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.client.aclose()
+
+    async def api_request(self, method, path, params=None):
+        """Async counterpart of api.api_request; `method` names the endpoint for method limits."""
+        rate_limited = False
+        for attempt in range(self.retries):
+            await self.limiter.acquire(method)
+            start = time.perf_counter()
+            try:
+                response = await self.client.get(path, params=params)
+            except httpx.TransportError as e:
+                metrics.observe('riot_api_request_seconds', time.perf_counter() - start, endpoint=method)
+                metrics.inc('riot_api_transport_errors_total', endpoint=method)
+                print(f"Transport error on {path}: {e} (Attempt {attempt + 1}/{self.retries})")
+                await asyncio.sleep(2 ** attempt)
+                continue
+            metrics.observe('riot_api_request_seconds', time.perf_counter() - start, endpoint=method)
+            metrics.inc('riot_api_responses_total', endpoint=method, status=response.status_code)
+            self.limiter.update(method, response.headers)
+            if response.status_code == 200:
+                return response.json()
+            elif response.status_code == 429:
+                rate_limited = True
+                retry_after = int(response.headers.get('Retry-After', 1))
+                print(f"Rate limit exceeded. Waiting {retry_after} seconds (Attempt {attempt + 1}/{self.retries})")
+                self.limiter.pause(retry_after)
+            elif response.status_code >= 500:
+                print(f"API error: {response.status_code} (Attempt {attempt + 1}/{self.retries})")
+                await asyncio.sleep(2 ** attempt)
+            else:
+                print(f"API error: {response.status_code} - {response.text}")
+                return None
+        if rate_limited:
+            raise RateLimitExceeded(f"Rate limit exceeded after {self.retries} retries")
+        return None
+
+    async def get_puuid(self, game_name, tag_line):
+        account = await self.api_request('account-by-riot-id', f"/riot/account/v1/accounts/by-riot-id/{game_name}/{tag_line}")
+        return account['puuid'] if account else None
+
+    async def get_match_ids(self, puuid, count=MATCHES_PER_PUUID):
+        """Match IDs of a PUUID, or None if they could not be fetched (unlike [] for an empty history)."""
+        params = {"queue": RANKED_SOLO_DUO_QUEUE_ID, "count": count}
+        try:
+            return await self.api_request('match-ids-by-puuid', f"/lol/match/v5/matches/by-puuid/{puuid}/ids", params)
+        except RateLimitExceeded as e:
+            print(e)
+            return None
+
+    async def get_match_details(self, match_id):
+        try:
+            return await self.api_request('match-by-id', f"/lol/match/v5/matches/{match_id}")
+        except RateLimitExceeded as e:
+            print(e)
+            return None
+
+class AsyncMatchCrawler:
+    """Breadth-first Ranked Solo/Duo crawl with many match-detail requests in flight.
+
+    A few workers claim PUUIDs from the persistent CrawlFrontier and expand them into match IDs
+    on a bounded queue drained by `concurrency` match workers, so match-ID lookups never run far
+    ahead of detail fetches. A PUUID is checkpointed as done once all of its matches are handled.
+    """
+    def __init__(self, client, db_path=DB_PATH, max_matches=MAX_MATCHES, concurrency=CRAWLER_CONCURRENCY, archive_path=ARCHIVE_PATH,
+                 stats_path=CRAWLER_STATS_PATH):
+        self.client = client
+        self.stats_path = stats_path
+        self.db_path = db_path
+        self.max_matches = max_matches
+        self.concurrency = concurrency
+        setup_database(db_path)
+        self.seen_match_ids = load_existing_match_ids(db_path)
+        self.match_count = len(self.seen_match_ids)
+        self.writer = MatchWriter(db_path)
+        self.archive = MatchArchive(archive_path)
+        self.frontier = CrawlFrontier(self.writer.conn)
+        self.frontier_changed = asyncio.Event()
+        self.pending_matches = asyncio.Queue(maxsize=concurrency * 2)
+        self._remaining = {}  # claimed PUUID -> its match IDs still in the queue, +1 while listing
+        self._outstanding = 0
+        self.drained = asyncio.Event()
+        self.done = asyncio.Event()
+
+    def _release_match(self, puuid):
+        self._remaining[puuid] -= 1
+        if self._remaining[puuid] == 0:
+            del self._remaining[puuid]
+            self.frontier.mark_done(puuid)
+
+    def _finish(self):
+        self._outstanding -= 1
+        if self._outstanding == 0:
+            self.frontier_changed.set()  # wake idle PUUID workers to detect the end of the crawl
+
+    async def _puuid_worker(self):
+        while True:
+            puuid = self.frontier.claim()
+            if puuid is None:
+                if self._outstanding == 0:
+                    self.drained.set()
+                    return
+                self.frontier_changed.clear()
+                await self.frontier_changed.wait()
+                continue
+            self._outstanding += 1
+            self._remaining[puuid] = 1
+            try:
+                match_ids = await self.client.get_match_ids(puuid)
+                if match_ids is None:
+                    # Not done: the PUUID stays pending and is retried by the next crawl
+                    del self._remaining[puuid]
+                    self.frontier.release(puuid, retry_later=True)
+                    continue
+                for match_id in match_ids:
+                    if match_id in self.seen_match_ids:
+                        continue
+                    self.seen_match_ids.add(match_id)
+                    self._outstanding += 1
+                    self._remaining[puuid] += 1
+                    await self.pending_matches.put((match_id, puuid))
+                self._release_match(puuid)
+            finally:
+                self._finish()
+
+    async def _match_worker(self):
+        while True:
+            match_id, puuid = await self.pending_matches.get()
+            try:
+                match_details = await self.client.get_match_details(match_id)
+                if match_details is None:
+                    self.seen_match_ids.discard(match_id)  # allow a retry via another player's history
+                else:
+                    self.archive.append(match_id, match_details)
+                player_data = process_match_details(match_id, match_details)
+                if player_data is None or self.done.is_set():
+                    continue
+                self.frontier.add(player['puuid'] for player in player_data)
+                self.frontier_changed.set()
+                self.writer.write(player_data)
+                self.match_count += 1
+                metrics.inc('crawler_matches_processed_total')
+                if self.match_count % 100 == 0:
+                    print(f"Processed {self.match_count} matches")
+                if self.match_count >= self.max_matches:
+                    self.done.set()
+            finally:
+                if not self.done.is_set():
+                    self._release_match(puuid)
+                self._finish()
+
+    def _write_stats(self):
+        metrics.set('crawler_frontier_pending', self.frontier.pending_count())
+        metrics.set('crawler_matches_stored', self.match_count)
+        metrics.write_json(self.stats_path)
+
+    async def _stats_writer(self):
+        while True:
+            await asyncio.sleep(CRAWLER_STATS_INTERVAL_SECONDS)
+            self._write_stats()
+
+    async def run(self, seed_puuid=None):
+        """Crawl until max_matches are stored or the frontier is exhausted.
+
+        seed_puuid joins the frontier if given; otherwise the crawl resumes from its pending rows.
+        """
+        if self.match_count >= self.max_matches:
+            return self.match_count
+        if seed_puuid is not None:
+            self.frontier.add([seed_puuid])
+        workers = [asyncio.create_task(self._puuid_worker()) for _ in range(max(1, self.concurrency // 10))]
+        workers += [asyncio.create_task(self._match_worker()) for _ in range(self.concurrency)]
+        workers.append(asyncio.create_task(self._stats_writer()))
+        waiters = [asyncio.create_task(self.drained.wait()), asyncio.create_task(self.done.wait())]
+        try:
+            await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in workers + waiters:
+                task.cancel()
+            # Bounded: a request stuck in the HTTP pool must not keep the buffered writes from closing
+            await asyncio.wait(workers + waiters, timeout=SHUTDOWN_TIMEOUT_SECONDS)
+            self.writer.flush()
+            self._write_stats()
+            self.writer.close()
+            self.archive.close()
+        return self.match_count
+
+async def crawl_ranked_solo_duo_data(riot_id, max_matches=MAX_MATCHES, concurrency=CRAWLER_CONCURRENCY,
+                                     base_url=f"https://{REGION}.api.riotgames.com", db_path=DB_PATH,
+                                     archive_path=ARCHIVE_PATH):
+    """Async counterpart of extract_data.extract_ranked_solo_duo_data."""
+    try:
+        game_name, tag_line = riot_id.split('/')
+    except ValueError:
+        print(f"Invalid riot_id format: {riot_id}. Expected 'gameName/tagLine' (e.g., 'AkemiMoon8/NA1')")
+        return
+
+    async with AsyncRiotClient(base_url=base_url, concurrency=concurrency) as client:
+        crawler = AsyncMatchCrawler(client, db_path=db_path, max_matches=max_matches, concurrency=concurrency, archive_path=archive_path)
+        pending = crawler.frontier.pending_count()
+        if pending:
+            print(f"Resuming crawl: {pending} pending PUUIDs, {crawler.frontier.done_count()} already processed")
+            puuid = None
+        else:
+            puuid = await client.get_puuid(game_name, tag_line)
+            if puuid is None:
+                print(f"Could not resolve PUUID for {riot_id}")
+                crawler.writer.close()
+                crawler.archive.close()
+                return
+            print(f"Initial PUUID: {puuid}")
+        start = time.perf_counter()
+        total = await crawler.run(puuid)
+        print(f"Total unique matches stored: {total} ({time.perf_counter() - start:.1f}s)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent Ranked Solo/Duo match crawler")
+    parser.add_argument('riot_id', nargs='?', default="Ballas/5555")
+    parser.add_argument('--max-matches', type=int, default=MAX_MATCHES)
+    parser.add_argument('--concurrency', type=int, default=CRAWLER_CONCURRENCY)
+    parser.add_argument('--base-url', default=f"https://{REGION}.api.riotgames.com",
+                        help="Riot API host, e.g. a local fake server for testing")
+    args = parser.parse_args()
+    asyncio.run(crawl_ranked_solo_duo_data(args.riot_id, args.max_matches, args.concurrency, args.base_url))
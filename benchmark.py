@@ -0,0 +1,585 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from multiprocessing import Pool, cpu_count
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import config
+from build_stats import count_builds
+from database import setup_database, load_existing_match_ids
+from match_data_analyzer import DAY_MS, PRIOR_WEIGHT, PRIOR_WIN_RATE, MatchDataAnalyzer, _aggregate_win_counts, _apply_prior, _mine_association_rules
+from win_rate_intervals import bootstrap_interval
+
+BASE_DIR = Path(__file__).resolve().parent
+CHAMPIONS_PATH = BASE_DIR / "static_data" / "champions.json"
+LANES = ['TOP', 'JUNGLE', 'MIDDLE', 'BOTTOM', 'UTILITY']
+GENERATOR_CHUNK_MATCHES = 50000
+SUITE_SIZES = [10_000, 100_000, 1_000_000]
+SYNTHETIC_START_MS = 1_704_067_200_000  # 2024-01-01 UTC
+SYNTHETIC_DAYS = 120  # synthetic matches are spread evenly over this many days
+SYNTHETIC_PATCH_DAYS = 14  # and over patches 14.1, 14.2, ... of this length
+SYNTHETIC_FORMAT = 2  # bumped when generated columns change, so kept suite databases are regenerated
+RUNE_STYLES = np.array([8000, 8100, 8200, 8300, 8400])
+ITEM_POOL = np.arange(3001, 3081)
+SUMMONER_SPELLS = np.array([14, 12, 7, 3, 21, 6])  # second spell next to Flash (4); junglers take Smite (11)
+
+def load_champion_names(path=CHAMPIONS_PATH):
+    """Return the champion ids (e.g. 'MissFortune') from the static champion catalog."""
+    with open(path, 'r', encoding='utf-8') as file:
+        return sorted(json.load(file)['data'].keys())
+
+def _ints_repr(columns, keys=None):
+    """str() of a list (or, with keys, a dict) of ints per row, as extract_player_data stores them, built column-wise."""
+    parts = [pd.Series(column).astype(str) for column in columns]
+    if keys is not None:
+        parts = [f"'{key}': " + part for key, part in zip(keys, parts)]
+    text = parts[0]
+    for part in parts[1:]:
+        text = text + ', ' + part
+    return ('[' + text + ']' if keys is None else '{' + text + '}').to_numpy()
+
+def _build_columns(rng, champions, lanes):
+    """Synthetic runes, items and summoner spells for participants playing champions (indices) in lanes."""
+    n = len(lanes)
+    # Most players of a champion take its usual pair of rune styles
+    usual = rng.random(n) < 0.8
+    primary = np.where(usual, champions % len(RUNE_STYLES), rng.integers(len(RUNE_STYLES), size=n))
+    offset = np.where(usual, 1 + champions % (len(RUNE_STYLES) - 1), rng.integers(1, len(RUNE_STYLES), size=n))
+    secondary = (primary + offset) % len(RUNE_STYLES)
+    primary_style, sub_style = RUNE_STYLES[primary], RUNE_STYLES[secondary]
+    # Keystone, then one of three runes per row, popular choices first as in real drafts
+    keystones = primary_style + 1 + rng.choice(4, size=n, p=[0.55, 0.25, 0.15, 0.05])
+    minors = primary_style[:, None] + np.array([10, 20, 30]) + rng.choice(3, size=(n, 3), p=[0.6, 0.3, 0.1])
+    selections = np.column_stack([keystones, minors])
+    secondary_runes = sub_style[:, None] + np.array([10, 20]) + rng.choice(3, size=(n, 2), p=[0.6, 0.3, 0.1])
+    items = np.where(rng.random((n, 6)) < 0.1, 0, rng.choice(ITEM_POOL, size=(n, 6)))
+    spell2 = np.where(lanes == 'JUNGLE', 11, rng.choice(SUMMONER_SPELLS, size=n))
+    return {
+        'primary_style': primary_style,
+        'primary_selections': _ints_repr(selections.T),
+        'sub_style': sub_style,
+        'sub_selections': _ints_repr(secondary_runes.T),
+        'stat_perks': np.full(n, str({'defense': 5001, 'flex': 5008, 'offense': 5005})),
+        'items': _ints_repr(items.T, [f'item{i}' for i in range(6)]),
+        'summoner_spells': _ints_repr([np.full(n, 4), spell2], ['summoner1Id', 'summoner2Id'])
+    }
+
+def _matchup_chunks(n_matches, seed=0, chunk_matches=GENERATOR_CHUNK_MATCHES):
+    """Yield the synthetic matchups frame in chunks of chunk_matches matches (see generate_matchups)."""
+    rng = np.random.default_rng(seed)
+    build_rng = np.random.default_rng([seed, 1])  # a separate stream keeps the picks and results above unchanged
+    champions = np.array(load_champion_names())
+    popularity = np.log(1.0 / (rng.permutation(len(champions)) + 5.0))
+    strength = rng.normal(0, 0.15, len(champions))
+    for start in range(0, n_matches, chunk_matches):
+        n_chunk = min(chunk_matches, n_matches - start)
+        gumbel = rng.gumbel(size=(n_chunk, len(champions)))
+        picks = np.argsort(-(popularity + gumbel), axis=1)[:, :10]
+        team_strength = strength[picks[:, :5]].sum(axis=1) - strength[picks[:, 5:]].sum(axis=1)
+        blue_wins = rng.random(n_chunk) < 1 / (1 + np.exp(-team_strength))
+        winner = np.concatenate([np.repeat(blue_wins[:, None], 5, axis=1), np.repeat(~blue_wins[:, None], 5, axis=1)], axis=1)
+        # Deterministic in the match number, so the random draws above do not change
+        game_creation = SYNTHETIC_START_MS + np.arange(start, start + n_chunk, dtype=np.int64) * (SYNTHETIC_DAYS * DAY_MS) // n_matches
+        patch = (game_creation - SYNTHETIC_START_MS) // (SYNTHETIC_PATCH_DAYS * DAY_MS) + 1
+        lanes = np.tile(LANES * 2, n_chunk)
+        yield pd.DataFrame({
+            'match_id': np.repeat([f"NA1_{i}" for i in range(start, start + n_chunk)], 10),
+            'lane': lanes,
+            'puuid': [f"puuid_{i}" for i in range(start * 10, (start + n_chunk) * 10)],
+            'champion': champions[picks.ravel()],
+            'winner': winner.ravel().astype(int),
+            'game_version': np.repeat([f"14.{number}.100.1" for number in patch], 10),
+            'game_creation': np.repeat(game_creation, 10),
+            **_build_columns(build_rng, picks.ravel(), lanes)
+        })
+
+def generate_matchups(n_matches, seed=0):
+    """Generate a synthetic matchups frame: 10 participants per match, one per lane per team.
+
+    Champion pick rates follow a long-tailed popularity curve and each champion has a latent
+    strength, so frequent itemsets and non-trivial win rates appear as they do in real data.
+    """
+    return pd.concat(_matchup_chunks(n_matches, seed), ignore_index=True)
+
+def build_synthetic_db(db_path, n_matches, seed=0):
+    """Write a synthetic matchups database at db_path (replacing any existing file), chunk by chunk."""
+    db_path = Path(db_path)
+    db_path.unlink(missing_ok=True)
+    setup_database(db_path)
+    conn = sqlite3.connect(db_path)
+    for chunk in _matchup_chunks(n_matches, seed):
+        chunk.to_sql('matchups', conn, if_exists='append', index=False)
+    conn.close()
+    return db_path
+
+def _legacy_process_match(row):
+    """Per-match worker of the original Pool.map implementation, kept as the benchmark reference."""
+    champions = row['champion']
+    lanes = row['lane']
+    winners = [champ for champ, win in zip(champions, row['winner']) if win == 1]
+    losers = [champ for champ, win in zip(champions, row['winner']) if win == 0]
+    wins = defaultdict(int)
+    total = defaultdict(int)
+    for idx, X in enumerate(winners):
+        lane_X = lanes[idx]
+        for jdx, Y in enumerate(losers):
+            lane_Y = lanes[jdx]
+            if lane_X == lane_Y:
+                wins[(X, Y, lane_X)] += 1
+                total[(X, Y, lane_X)] += 1
+    for idx, X in enumerate(losers):
+        lane_X = lanes[idx]
+        for jdx, Y in enumerate(winners):
+            lane_Y = lanes[jdx]
+            if lane_X == lane_Y:
+                total[(X, Y, lane_X)] += 1
+    for idx, champ in enumerate(champions):
+        lane = lanes[idx]
+        win = row['winner'][idx]
+        key = (champ, None, lane)
+        total[key] += 1
+        if win == 1:
+            wins[key] += 1
+    return wins, total
+
+def legacy_calculate_win_rates(df):
+    """Original groupby + Pool.map over iterrows path."""
+    match_data = df.groupby('match_id').agg({'champion': list, 'lane': list, 'winner': list}).reset_index()
+    with Pool(cpu_count()) as pool:
+        results = pool.map(_legacy_process_match, [row for _, row in match_data.iterrows()])
+    wins = defaultdict(int)
+    total = defaultdict(int)
+    for win_dict, total_dict in results:
+        for key in win_dict:
+            wins[key] += win_dict[key]
+        for key in total_dict:
+            total[key] += total_dict[key]
+    rows = []
+    for (champion, opponent, lane), win_count in wins.items():
+        total_count = total[(champion, opponent, lane)]
+        rows.append({
+            'champion': champion, 'opponent': opponent, 'lane': lane, 'wins': win_count,
+            'total_matches': total_count, 'win_rate': (win_count + 5) / (total_count + 10) * 100
+        })
+    return pd.DataFrame(rows)
+
+def vectorized_calculate_win_rates(df):
+    return _apply_prior(_aggregate_win_counts(df))
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def _traced(fn, *args):
+    """Run fn and return (result, seconds, peak traced bytes); timed without tracing first."""
+    _, seconds = _timed(fn, *args)
+    tracemalloc.start()
+    result = fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak
+
+def bench_win_rates(sizes):
+    for n_matches in sizes:
+        df = generate_matchups(n_matches)
+        legacy, legacy_time = _timed(legacy_calculate_win_rates, df)
+        vectorized, vectorized_time = _timed(vectorized_calculate_win_rates, df)
+
+        # Baselines were unaffected by the legacy lane-pairing bug, so they must agree exactly
+        key = ['champion', 'lane']
+        legacy_base = legacy[legacy['opponent'].isna()].set_index(key)['total_matches'].sort_index()
+        vector_base = vectorized[vectorized['opponent'].isna()].set_index(key)['total_matches'].sort_index()
+        assert legacy_base.equals(vector_base.loc[legacy_base.index]), "baseline counts diverged"
+
+        print(f"calculate_win_rates @ {n_matches} matches: legacy {legacy_time:.3f}s, "
+              f"vectorized {vectorized_time:.3f}s ({legacy_time / vectorized_time:.1f}x)")
+
+def _random_drafts(champions, n_drafts, seed=0):
+    rng = np.random.default_rng(seed)
+    picks = np.argsort(rng.random((n_drafts, len(champions))), axis=1)[:, :10]
+    names = np.asarray(champions, dtype=object)[picks]
+    return names[:, :5].tolist(), names[:, 5:].tolist()
+
+def bench_batch_predictions(n_matches, batch_sizes=(1, 100, 10000)):
+    """Drafts per second for looped vs batched analyzer calls and the HTTP batch endpoint."""
+    from fastapi.testclient import TestClient
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config.DB_PATH = build_synthetic_db(Path(tmp) / "bench.db", n_matches)
+        sys.path.append(str(BASE_DIR / "src" / "backend"))
+        import app as backend
+        analyzer = backend.analyzer
+        client = TestClient(backend.app)
+        roles = ['Top', 'Jungle', 'Mid', 'Bottom', 'Support']
+        client.get('/')  # warm up the client's event loop portal
+
+        for batch_size in batch_sizes:
+            blue, red = _random_drafts(analyzer.all_champions, batch_size)
+            _, looped = _timed(lambda: [analyzer.estimate_team_win_rate(b, r) for b, r in zip(blue, red)])
+            _, batched = _timed(analyzer.estimate_team_win_rates, blue, red)
+            payload = [{'blue_team': dict(zip(roles, b)), 'red_team': dict(zip(roles, r))} for b, r in zip(blue, red)]
+            response, http = _timed(client.post, '/predict_team_win_rate/batch', json=payload)
+            assert response.status_code == 200 and len(response.json()['predictions']) == batch_size
+            print(f"batch of {batch_size}: looped {batch_size / looped:,.0f} drafts/s, "
+                  f"batched {batch_size / batched:,.0f} drafts/s, HTTP batch {batch_size / http:,.0f} drafts/s")
+
+def legacy_compute_association_rules(df, min_support, min_threshold=0.1):
+    """Original dense TransactionEncoder + mlxtend apriori path."""
+    from mlxtend.frequent_patterns import apriori, association_rules
+    from mlxtend.preprocessing import TransactionEncoder
+
+    winning_teams = df[df['winner'] == 1].groupby('match_id')['champion'].apply(list)
+    te = TransactionEncoder()
+    df_encoded = pd.DataFrame(te.fit(winning_teams).transform(winning_teams), columns=te.columns_)
+    frequent_itemsets = apriori(df_encoded, min_support=min_support, use_colnames=True)
+    rules = association_rules(frequent_itemsets, metric="confidence", min_threshold=min_threshold)
+    return rules[rules['consequents'].apply(lambda x: len(x) == 1)]
+
+def _rule_set(rules):
+    return {
+        (tuple(sorted(antecedents)), tuple(consequents)): (support, confidence)
+        for antecedents, consequents, support, confidence in rules[['antecedents', 'consequents', 'support', 'confidence']].itertuples(index=False)
+    }
+
+def bench_rules(sizes, min_supports=(0.005, 0.001)):
+    """Time and peak memory of rule mining, checked against the mlxtend reference."""
+    for n_matches in sizes:
+        df = generate_matchups(n_matches)
+        for min_support in min_supports:
+            mined, mined_time, mined_peak = _traced(_mine_association_rules, df, min_support, 0.1)
+            try:
+                legacy, legacy_time, legacy_peak = _traced(legacy_compute_association_rules, df, min_support)
+            except MemoryError:
+                print(f"rules @ {n_matches} matches, min_support {min_support}: {len(mined)} rules, "
+                      f"mlxtend out of memory, miner {mined_time:.2f}s / {mined_peak / 2 ** 20:,.0f} MiB")
+                continue
+            expected, actual = _rule_set(legacy), _rule_set(mined)
+            assert expected.keys() == actual.keys(), "rule sets diverged"
+            assert all(np.allclose(expected[key], actual[key]) for key in expected), "rule metrics diverged"
+            print(f"rules @ {n_matches} matches, min_support {min_support}: {len(mined)} rules, "
+                  f"mlxtend {legacy_time:.2f}s / {legacy_peak / 2 ** 20:,.0f} MiB, "
+                  f"miner {mined_time:.2f}s / {mined_peak / 2 ** 20:,.0f} MiB")
+
+def _rss_mib():
+    """Current resident set size of this process (Linux)."""
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+
+def _worker_rss(db_path, mode, results):
+    """Build an analyzer the way an API worker would and report its RSS once it is ready to serve."""
+    config.DB_PATH = db_path
+    analyzer = MatchDataAnalyzer(db_path, refresh=False)
+    if mode != 'serving':
+        analyzer.rebuild_caches()
+        if mode == 'full frame kept':
+            # Steady state of the original analyzer: caches plus every matchups column in memory
+            analyzer._df = pd.read_sql_query("SELECT * FROM matchups", analyzer.conn)
+    results.put((mode, _rss_mib()))
+
+def bench_worker_memory(n_matches):
+    """Per-worker RSS after startup: full frame kept vs frames released after a rebuild vs serving mode."""
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = build_synthetic_db(Path(tmp) / "rss.db", n_matches)
+        MatchDataAnalyzer(db_path)  # persist the caches the serving mode loads
+        for mode in ['full frame kept', 'rebuild, frames released', 'serving']:
+            results = context.Queue()
+            worker = context.Process(target=_worker_rss, args=(db_path, mode, results))
+            worker.start()
+            _, rss = results.get()
+            worker.join()
+            print(f"worker RSS @ {n_matches} matches, {mode}: {rss:,.0f} MiB")
+
+def _serve(db_path, port):
+    """Run the backend app with uvicorn against db_path (spawned server process for the load test)."""
+    import uvicorn
+    config.DB_PATH = db_path
+    sys.path.append(str(BASE_DIR / "src" / "backend"))
+    import app as backend
+    uvicorn.run(backend.app, host="127.0.0.1", port=port, log_level="warning")
+
+async def _load_client(client, requests_per_client, drafts, champions, rng, latencies):
+    roles = ['Top', 'Jungle', 'Mid', 'Bottom', 'Support']
+    for _ in range(requests_per_client):
+        kind = rng.choice(['predict', 'suggest', 'search'])
+        if kind == 'predict':
+            blue, red = drafts[rng.integers(len(drafts))]
+            request = client.post('/predict_team_win_rate', json={'blue_team': dict(zip(roles, blue)), 'red_team': dict(zip(roles, red))})
+        elif kind == 'suggest':
+            champion, enemy = rng.choice(champions, 2, replace=False)
+            request = client.post('/suggest_allies', json={'champion': champion, 'enemy_champion': enemy, 'lane': 'TOP'})
+        else:
+            request = client.get(f"/champions/{rng.choice(champions)[:2]}")
+        start = time.perf_counter()
+        response = await request
+        latencies[kind].append(time.perf_counter() - start)
+        assert response.status_code in (200, 404), response.text
+
+async def _run_load(base_url, n_clients, requests_per_client, drafts, champions):
+    import httpx
+
+    latencies = defaultdict(list)
+    limits = httpx.Limits(max_connections=n_clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            _load_client(client, requests_per_client, drafts, champions, np.random.default_rng(seed), latencies)
+            for seed in range(n_clients)
+        ])
+        elapsed = time.perf_counter() - start
+    return latencies, elapsed
+
+def bench_load(n_matches, client_counts=(1, 8, 32), requests_per_client=200, port=8899):
+    """p50/p99 latency per endpoint with concurrent HTTP clients against a uvicorn server."""
+    import httpx
+
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = build_synthetic_db(Path(tmp) / "load.db", n_matches)
+        analyzer = MatchDataAnalyzer(db_path)
+        champions = analyzer.all_champions
+        drafts = list(zip(*_random_drafts(champions, 1000)))
+        analyzer.close()
+        server = context.Process(target=_serve, args=(db_path, port))
+        server.start()
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            for _ in range(300):
+                try:
+                    if httpx.get(f"{base_url}/ready").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    time.sleep(0.1)
+            for n_clients in client_counts:
+                latencies, elapsed = asyncio.run(_run_load(base_url, n_clients, requests_per_client, drafts, champions))
+                total = sum(len(values) for values in latencies.values())
+                summary = ", ".join(
+                    f"{kind} p50 {np.percentile(values, 50) * 1000:.1f}ms p99 {np.percentile(values, 99) * 1000:.1f}ms"
+                    for kind, values in sorted(latencies.items())
+                )
+                print(f"load @ {n_clients} clients: {total / elapsed:,.0f} req/s; {summary}")
+        finally:
+            server.terminate()
+            server.join()
+
+def _legacy_load_match_ids(db_path):
+    """Original loader: every distinct match ID as a str in a Python set."""
+    conn = sqlite3.connect(db_path)
+    match_ids = set(row[0] for row in conn.execute("SELECT DISTINCT match_id FROM matchups").fetchall())
+    conn.close()
+    return match_ids
+
+def bench_seen_ids(sizes=(1_000_000, 10_000_000)):
+    """Startup time, peak memory and lookup rate of the stored match ID set, one row per match."""
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_matches in sizes:
+            db_path = Path(tmp) / f"ids_{n_matches}.db"
+            setup_database(db_path)
+            numbers = rng.choice(10 ** 10, size=n_matches, replace=False) + 4_000_000_000
+            conn = sqlite3.connect(db_path)
+            conn.executemany("INSERT INTO matchups (match_id, puuid) VALUES (?, 'p')", ((f"NA1_{n}",) for n in numbers.tolist()))
+            conn.commit()
+            conn.close()
+
+            probes = [f"NA1_{n}" for n in np.concatenate([numbers[:50000], numbers[:50000] + 1]).tolist()]
+            for name, loader in [('set of str', _legacy_load_match_ids), ('SeenMatchIds', load_existing_match_ids)]:
+                seen, seconds, peak = _traced(loader, db_path)
+                _, lookup = _timed(lambda: sum(match_id in seen for match_id in probes))
+                print(f"{name} @ {n_matches:,} match IDs: load {seconds:.2f}s, peak {peak / 2 ** 20:,.0f} MiB, "
+                      f"{len(probes) / lookup:,.0f} lookups/s")
+            db_path.unlink()
+
+def _record(n_matches, metric, value, unit):
+    return {'benchmark': 'suite', 'matches': n_matches, 'metric': metric, 'value': round(float(value), 6), 'unit': unit}
+
+def _latency_records(n_matches, name, samples):
+    return [
+        _record(n_matches, f"{name}_p50", np.percentile(samples, 50) * 1000, 'ms'),
+        _record(n_matches, f"{name}_p99", np.percentile(samples, 99) * 1000, 'ms')
+    ]
+
+def _sample_latencies(fn, arguments):
+    samples = []
+    for args in arguments:
+        start = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def _peak_rss_mib():
+    """Peak resident set size of this process (Linux reports ru_maxrss in KiB)."""
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _suite_worker(db_path, n_matches, phase, n_requests, results):
+    """Run one suite phase in a fresh process so its time and RSS are not skewed by earlier phases."""
+    config.DB_PATH = db_path
+    records = []
+    if phase == 'build':
+        analyzer = MatchDataAnalyzer(db_path, refresh=False)
+        _, seconds = _timed(analyzer.rebuild_caches)
+        records += [_record(n_matches, 'cache_build', seconds, 's'), _record(n_matches, 'cache_build_peak_rss', _peak_rss_mib(), 'MiB')]
+    elif phase == 'components':
+        analyzer = MatchDataAnalyzer(db_path, refresh=False)
+        df, seconds = _timed(analyzer._read_matchups)
+        records.append(_record(n_matches, 'read_matchups', seconds, 's'))
+        win_rates, seconds = _timed(lambda: _apply_prior(_aggregate_win_counts(df)))
+        records.append(_record(n_matches, 'calculate_win_rates', seconds, 's'))
+        _, seconds = _timed(bootstrap_interval, win_rates['wins'], win_rates['total_matches'], PRIOR_WEIGHT, PRIOR_WIN_RATE)
+        records.append(_record(n_matches, 'win_rate_bootstrap', seconds, 's'))
+        _, seconds = _timed(_mine_association_rules, df, 0.005, 0.1)
+        records.append(_record(n_matches, 'mine_association_rules', seconds, 's'))
+        _, seconds = _timed(lambda: count_builds(analyzer._read_build_chunks(analyzer._get_max_rowid())))
+        records.append(_record(n_matches, 'count_builds', seconds, 's'))
+    elif phase == 'startup':
+        analyzer, seconds = _timed(MatchDataAnalyzer, db_path, refresh=False, read_only=True)
+        records += [_record(n_matches, 'startup', seconds, 's'), _record(n_matches, 'startup_rss', _rss_mib(), 'MiB')]
+        blue, red = _random_drafts(analyzer.all_champions, n_requests, seed=1)
+        pairs = np.random.default_rng(2).choice(analyzer.all_champions, (n_requests, 2))
+        records += _latency_records(n_matches, 'analyzer_predict', _sample_latencies(analyzer.estimate_team_win_rate, zip(blue, red)))
+        records += _latency_records(n_matches, 'analyzer_predict_cached', _sample_latencies(analyzer.estimate_team_win_rate, zip(blue, red)))
+        records += _latency_records(n_matches, 'analyzer_matchup', _sample_latencies(
+            analyzer.analyze_champion_matchup, ((champion, enemy, 'TOP') for champion, enemy in pairs.tolist())
+        ))
+        records += _latency_records(n_matches, 'analyzer_batch_100', _sample_latencies(
+            analyzer.estimate_team_win_rates, ((blue[start:start + 100], red[start:start + 100]) for start in range(0, n_requests, 100))
+        ))
+        records.append(_record(n_matches, 'serving_rss', _rss_mib(), 'MiB'))
+    elif phase == 'http':
+        from fastapi.testclient import TestClient
+        sys.path.append(str(BASE_DIR / "src" / "backend"))
+        import app as backend
+        client = TestClient(backend.app)
+        client.get('/')  # warm up the client's event loop portal
+        roles = ['Top', 'Jungle', 'Mid', 'Bottom', 'Support']
+        blue, red = _random_drafts(backend.analyzer.all_champions, n_requests, seed=3)
+        drafts = [{'blue_team': dict(zip(roles, b)), 'red_team': dict(zip(roles, r))} for b, r in zip(blue, red)]
+        pairs = np.random.default_rng(4).choice(backend.analyzer.all_champions, (n_requests, 2)).tolist()
+        records += _latency_records(n_matches, 'http_predict', _sample_latencies(
+            lambda draft: client.post('/predict_team_win_rate', json=draft), ((draft,) for draft in drafts)
+        ))
+        records += _latency_records(n_matches, 'http_suggest', _sample_latencies(
+            lambda champion, enemy: client.post('/suggest_allies', json={'champion': champion, 'enemy_champion': enemy, 'lane': 'TOP'}),
+            pairs
+        ))
+        records += _latency_records(n_matches, 'http_batch_100', _sample_latencies(
+            lambda batch: client.post('/predict_team_win_rate/batch', json=batch),
+            ((drafts[start:start + 100],) for start in range(0, n_requests, 100))
+        ))
+        records += _latency_records(n_matches, 'http_builds', _sample_latencies(
+            lambda champion, enemy: client.post('/recommend_builds', json={'champion': champion, 'enemy_champion': enemy, 'lane': 'TOP'}),
+            pairs
+        ))
+        records += _latency_records(n_matches, 'http_champion_search', _sample_latencies(
+            lambda champion: client.get(f"/champions/{champion[:2]}"), ((champion,) for champion, _ in pairs)
+        ))
+    results.put(records)
+
+def bench_suite(sizes, data_dir=None, n_requests=1000):
+    """Generation, cache build, startup, latency and memory per database size, as machine-readable records.
+
+    Each phase runs in a spawned process. Seeded databases are kept in data_dir when it is given,
+    so repeated runs (e.g. before and after a change) measure the same data.
+    """
+    context = multiprocessing.get_context('spawn')
+    records = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_matches in sizes:
+            db_path = Path(data_dir or tmp) / f"synthetic_{n_matches}_seed0_v{SYNTHETIC_FORMAT}.db"
+            if not db_path.exists():
+                _, seconds = _timed(build_synthetic_db, db_path, n_matches)
+                records.append(_record(n_matches, 'generate', seconds, 's'))
+                print(f"suite @ {n_matches:,} matches: generate {seconds:,.3f} s")
+            records.append(_record(n_matches, 'db_size', db_path.stat().st_size / 2 ** 20, 'MiB'))
+            for phase in ['build', 'components', 'startup', 'http']:
+                results = context.Queue()
+                worker = context.Process(target=_suite_worker, args=(db_path, n_matches, phase, n_requests, results))
+                worker.start()
+                phase_records = results.get()
+                worker.join()
+                for record in phase_records:
+                    print(f"suite @ {n_matches:,} matches: {record['metric']} {record['value']:,.3f} {record['unit']}")
+                records += phase_records
+    return records
+
+def _run_metadata():
+    import platform
+    try:
+        import subprocess
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=BASE_DIR, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'cpu_count': cpu_count()
+    }
+
+def compare_results(old_path, new_path):
+    """Print metric-by-metric changes between two --output files."""
+    def load(path):
+        with open(path) as file:
+            return {(r['benchmark'], r['matches'], r['metric']): r for r in json.load(file)['results']}
+    old, new = load(old_path), load(new_path)
+    for key in sorted(old.keys() | new.keys()):
+        before, after = old.get(key), new.get(key)
+        benchmark, n_matches, metric = key
+        if before is None or after is None:
+            print(f"{benchmark} @ {n_matches:,} {metric}: only in {'new' if before is None else 'old'}")
+            continue
+        change = f"{after['value'] / before['value']:.2f}x" if before['value'] else "n/a"
+        print(f"{benchmark} @ {n_matches:,} {metric}: {before['value']:,.3f} -> {after['value']:,.3f} {after['unit']} ({change})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark analyzer hot paths on synthetic matches")
+    benchmarks = ['win_rates', 'batch', 'seen_ids', 'rules', 'memory', 'load', 'suite']
+    parser.add_argument('benchmarks', nargs='*', help=f"any of {', '.join(benchmarks)} (default: win_rates batch)")
+    parser.add_argument('--sizes', type=int, nargs='+', help="match counts (default: 1000 15000, or 10000 100000 1000000 for suite)")
+    parser.add_argument('--data-dir', type=Path, help="keep the suite's seeded databases here and reuse them across runs")
+    parser.add_argument('--requests', type=int, default=1000, help="requests per latency measurement in the suite")
+    parser.add_argument('--output', type=Path, help="write the suite results as JSON")
+    parser.add_argument('--compare', type=Path, nargs=2, metavar=('OLD', 'NEW'), help="compare two --output files and exit")
+    args = parser.parse_args()
+    if args.compare:
+        compare_results(*args.compare)
+        sys.exit()
+    args.benchmarks = args.benchmarks or ['win_rates', 'batch']
+    if unknown := set(args.benchmarks) - set(benchmarks):
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+    sizes = args.sizes or [1000, 15000]
+    if 'win_rates' in args.benchmarks:
+        bench_win_rates(sizes)
+    if 'batch' in args.benchmarks:
+        bench_batch_predictions(max(sizes))
+    if 'rules' in args.benchmarks:
+        bench_rules(sizes)
+    if 'load' in args.benchmarks:
+        bench_load(max(sizes))
+    if 'memory' in args.benchmarks:
+        bench_worker_memory(max(sizes))
+    if 'seen_ids' in args.benchmarks:
+        bench_seen_ids()
+    if 'suite' in args.benchmarks:
+        if args.data_dir:
+            args.data_dir.mkdir(parents=True, exist_ok=True)
+        results = bench_suite(args.sizes or SUITE_SIZES, args.data_dir, args.requests)
+        if args.output:
+            with open(args.output, 'w') as file:
+                json.dump({'meta': _run_metadata(), 'results': results}, file, indent=2)
+            print(f"Wrote {len(results)} results to {args.output}")
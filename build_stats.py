@@ -0,0 +1,96 @@
+import re
+import numpy as np
+import pandas as pd
+
+BUILD_CHUNK_ROWS = 200_000  # matchups rows parsed and counted at a time
+BUILD_KINDS = ('item', 'keystone', 'rune_page', 'summoner_spells')
+BUILD_COLUMNS = [
+    'champion', 'lane', 'winner', 'primary_style', 'primary_selections',
+    'sub_style', 'sub_selections', 'items', 'summoner_spells'
+]
+_DICT_VALUE = re.compile(r": (-?\d+)|\n")  # values of a str() dict of ints, or a row break
+_LIST_VALUE = re.compile(r"(-?\d+)|\n")
+
+def _parse_ints(values, pattern, width):
+    """Parse str() reprs written by api.extract_player_data into an (n, width) int64 array.
+
+    One regex pass over the joined strings; if any row does not hold exactly width integers,
+    the rows are parsed one by one instead, padded or cut to width with zeros.
+    """
+    values = values.tolist()
+    tokens = pattern.findall('\n'.join(values) + '\n')
+    # A row break matches as '' and must follow every width numbers
+    if len(tokens) == len(values) * (width + 1) and tokens.count('') == len(values) and not any(tokens[width::width + 1]):
+        return np.fromstring(' '.join(tokens), dtype=np.int64, sep=' ').reshape(len(values), width)
+    parsed = np.zeros((len(values), width), dtype=np.int64)
+    for row, value in enumerate(values):
+        numbers = [int(token) for token in pattern.findall(value) if token][:width]
+        parsed[row, :len(numbers)] = numbers
+    return parsed
+
+def _kind_counts(kind, champion, lane, winner, values, names, template='{}'):
+    """Wins and games per (champion, lane, build) where the build is the tuple of values' columns,
+    formatted with template.
+
+    champion and lane are integer codes into names['champion'] and names['lane'].
+    """
+    columns = [f'v{i}' for i in range(len(values))]
+    frame = pd.DataFrame({'champion': champion, 'lane': lane, 'winner': winner, **dict(zip(columns, values))})
+    counts = frame.groupby(['champion', 'lane', *columns], sort=False)['winner'].agg(['sum', 'count']).reset_index()
+    return pd.DataFrame({
+        'champion': names['champion'].take(counts['champion'].to_numpy()),
+        'lane': names['lane'].take(counts['lane'].to_numpy()),
+        'kind': kind,
+        'build': list(map(template.format, *(counts[column].tolist() for column in columns))),
+        'wins': counts['sum'].to_numpy(dtype=np.int64),
+        'total_matches': counts['count'].to_numpy(dtype=np.int64)
+    })
+
+def _chunk_counts(chunk):
+    """Build counts of one chunk of matchups rows."""
+    champion, champion_names = pd.factorize(chunk['champion'])
+    lane, lane_names = pd.factorize(chunk['lane'])
+    names = {'champion': np.asarray(champion_names, dtype=object), 'lane': np.asarray(lane_names, dtype=object)}
+    winner = chunk['winner'].to_numpy(dtype=np.int64)
+    items = _parse_ints(chunk['items'], _DICT_VALUE, 6)
+    primary = _parse_ints(chunk['primary_selections'], _LIST_VALUE, 4)
+    sub = _parse_ints(chunk['sub_selections'], _LIST_VALUE, 2)
+    spells = _parse_ints(chunk['summoner_spells'], _DICT_VALUE, 2)
+    primary_style = chunk['primary_style'].to_numpy(dtype=np.int64)
+    sub_style = chunk['sub_style'].to_numpy(dtype=np.int64)
+
+    # Every distinct item a participant finished with counts once; empty slots are 0
+    items.sort(axis=1)
+    owned = items > 0
+    owned[:, 1:] &= items[:, 1:] != items[:, :-1]
+    rows = np.nonzero(owned)[0]
+    parts = [
+        _kind_counts('item', champion[rows], lane[rows], winner[rows], [items[owned]], names),
+        _kind_counts('keystone', champion, lane, winner, [primary[:, 0]], names),
+        _kind_counts('rune_page', champion, lane, winner, [primary_style, *primary.T, sub_style, *sub.T], names, '{}:{},{},{},{}|{}:{},{}'),
+        _kind_counts('summoner_spells', champion, lane, winner, [spells.min(axis=1), spells.max(axis=1)], names, '{},{}')
+    ]
+    return pd.concat(parts, ignore_index=True)
+
+def _merge(counts):
+    return pd.concat(counts, ignore_index=True).groupby(['champion', 'lane', 'kind', 'build'], sort=False)[['wins', 'total_matches']].sum().reset_index()
+
+def count_builds(chunks):
+    """Fold chunks of matchups rows (BUILD_COLUMNS, none NULL) into wins and games per (champion, lane, kind, build).
+
+    Each chunk is parsed and reduced on its own. Chunk counts are merged into the running totals
+    once they add up to as many rows as the totals hold, so every row is re-merged only a
+    logarithmic number of times and memory grows with the number of distinct builds.
+    """
+    totals = pd.DataFrame({
+        'champion': pd.Series(dtype=object), 'lane': pd.Series(dtype=object), 'kind': pd.Series(dtype=object),
+        'build': pd.Series(dtype=object), 'wins': pd.Series(dtype=np.int64), 'total_matches': pd.Series(dtype=np.int64)
+    })
+    pending, pending_rows = [], 0
+    for chunk in chunks:
+        counts = _chunk_counts(chunk)
+        pending.append(counts)
+        pending_rows += len(counts)
+        if pending_rows >= len(totals):
+            totals, pending, pending_rows = _merge([totals, *pending]), [], 0
+    return _merge([totals, *pending]) if pending else totals
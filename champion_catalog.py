@@ -0,0 +1,63 @@
+import gzip
+import hashlib
+import json
+import sqlite3
+from config import CHAMPIONS_DB_PATH, CHAMPIONS_JSON_PATH
+
+def _encode(content):
+    """Serialize like FastAPI's JSONResponse."""
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode('utf-8')
+
+class ChampionCatalog:
+    """Static champion data loaded once, with the full response pre-encoded and a substring index.
+
+    Every substring of each champion's lowercased name and key maps to the champions containing
+    it, so a search is one dict lookup; encoded search responses are cached per query.
+    """
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.body = _encode(catalog)
+        self.gzip_body = gzip.compress(self.body, mtime=0)
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest() + '"'
+
+        champions = list(catalog.get('data', {}).items())
+        # Fragments of the search response: [lowercased name, champion data]
+        self._fragments = [_encode([data.get('name', key).lower(), data]) for key, data in champions]
+        self._index = {}
+        for position, (key, data) in enumerate(champions):
+            for text in {data.get('name', key).lower(), key.lower()}:
+                for start in range(len(text)):
+                    for end in range(start + 1, len(text) + 1):
+                        positions = self._index.setdefault(text[start:end], [])
+                        if not positions or positions[-1] != position:
+                            positions.append(position)
+        self._search_cache = {}
+
+    @classmethod
+    def load(cls, db_path=CHAMPIONS_DB_PATH, json_path=CHAMPIONS_JSON_PATH):
+        """Load from the champions table written by migrate_champions_to_db.py, else from champions.json."""
+        if db_path.exists():
+            conn = sqlite3.connect(db_path)
+            try:
+                rows = conn.execute("SELECT id, data FROM champions ORDER BY rowid").fetchall()
+            finally:
+                conn.close()
+            if rows:
+                data = {champion_id: json.loads(champion) for champion_id, champion in rows}
+                version = next(iter(data.values())).get('version')
+                return cls({'type': 'champion', 'format': 'standAloneComplex', 'version': version, 'data': data})
+        with open(json_path, 'r', encoding='utf-8') as file:
+            return cls(json.load(file))
+
+    def search(self, query):
+        """Encoded JSON list of [name, data] for champions whose name or key contains query, or None."""
+        query = query.lower()
+        body = self._search_cache.get(query)
+        if body is None:
+            positions = self._index.get(query)
+            if not positions:
+                return None
+            # Positions were appended in catalog order, so results keep the catalog order
+            body = b'[' + b','.join(self._fragments[position] for position in positions) + b']'
+            self._search_cache[query] = body
+        return body
@@ -10,6 +10,34 @@ MAX_MATCHES = 15000
 MATCHES_PER_PUUID = 30
 RANKED_SOLO_DUO_QUEUE_ID = 420
 REMAKE_THRESHOLD = 180
+CRAWLER_CONCURRENCY = 20
+FRONTIER_PRIORITY = "fewest_seen"  # Or "fifo"; see crawl_frontier.PRIORITY_ORDER
+WRITE_BATCH_SIZE = 100  # Matches per matchups transaction
+WRITE_FLUSH_SECONDS = 5.0  # Commit a partial batch once it is this old
+HTTP_POOL_SIZE = 10
+HTTP_MAX_RETRIES = 3  # Connection errors and 5xx responses; 429s are handled by api.api_request
+HTTP_BACKOFF_FACTOR = 0.5
+# (connect, read) timeouts in seconds per endpoint
+HTTP_TIMEOUTS = {
+    "account": (3.05, 5),
+    "match_ids": (3.05, 5),
+    "match": (3.05, 15),
+}
+HTTP_DEFAULT_TIMEOUT = (3.05, 10)
+# Riot development-key limits ("count:seconds" windows), used until response headers report the real ones
+DEFAULT_APP_RATE_LIMIT = "20:1,100:120"
+RESPONSE_CACHE_SIZE = 10000  # Draft predictions and matchup analyses kept per API worker
+RESPONSE_CACHE_TTL_SECONDS = 300
+WIN_RATE_INTERVAL_METHOD = "wilson"  # Or "bootstrap"; see win_rate_intervals.INTERVAL_METHODS
+CACHE_POLL_SECONDS = 5  # How often API workers check for a newly published win rate matrix
+CACHE_REFRESH_SECONDS = 60  # Least time between background refreshes while the crawler keeps adding matches
+CRAWLER_STATS_INTERVAL_SECONDS = 30  # How often the async crawler rewrites CRAWLER_STATS_PATH
+REBUILD_PROFILE_PATH = os.getenv("REBUILD_PROFILE_PATH")  # cProfile dump of each full cache rebuild, if set
 
 BASE_DIR = Path(__file__).resolve().parent
-DB_PATH = BASE_DIR / "data" / "ranked_solo_duo_matchups.db"
\ No newline at end of file
+DB_PATH = BASE_DIR / "data" / "ranked_solo_duo_matchups.db"
+DB_V2_PATH = BASE_DIR / "data" / "ranked_solo_duo_matchups_v2.db"
+CHAMPIONS_JSON_PATH = BASE_DIR / "static_data" / "champions.json"
+CHAMPIONS_DB_PATH = BASE_DIR / "data" / "champions.db"  # Written by migrate_champions_to_db.py
+CRAWLER_STATS_PATH = BASE_DIR / "data" / "crawler_stats.json"  # Metrics snapshot written by the crawlers
+ARCHIVE_PATH = BASE_DIR / "data" / "match_archive.bin"  # Raw match payloads; offset index next to it (.idx.db)
\ No newline at end of file
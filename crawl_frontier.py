@@ -0,0 +1,78 @@
+import time
+from config import FRONTIER_PRIORITY
+
+PRIORITY_ORDER = {
+    # Players seen in few stored matches are likely to have the most matches we have not seen yet
+    'fewest_seen': "times_seen ASC, discovered_at ASC",
+    # Breadth-first in discovery order
+    'fifo': "discovered_at ASC",
+}
+
+class CrawlFrontier:
+    """Persistent crawl frontier of PUUIDs stored in the crawl_frontier table.
+
+    It shares a connection with the MatchWriter that stores the crawled matches and never
+    commits on its own: discoveries and 'done' marks become durable in the same transaction
+    as the matches they came from. A PUUID is marked done only after all of its matches were
+    handed to the writer, so a crash at worst re-fetches the match-ID list of PUUIDs that were
+    in progress, and a restart resumes from the pending rows without a seed lookup.
+    """
+    def __init__(self, conn, priority=FRONTIER_PRIORITY):
+        if priority not in PRIORITY_ORDER:
+            raise ValueError(f"Unknown frontier priority {priority!r}, expected one of {sorted(PRIORITY_ORDER)}")
+        self.conn = conn
+        self.order = PRIORITY_ORDER[priority]
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS crawl_frontier (
+                puuid TEXT PRIMARY KEY,
+                status TEXT NOT NULL DEFAULT 'pending',
+                times_seen INTEGER NOT NULL DEFAULT 0,
+                discovered_at REAL NOT NULL,
+                crawled_at REAL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_frontier_pending ON crawl_frontier (status, times_seen, discovered_at)")
+        self.conn.commit()
+        self._claimed = set()
+        self._deferred = set()  # released after a failed fetch; left pending for the next crawl
+
+    def add(self, puuids):
+        """Record PUUIDs seen in a stored match; new ones join the frontier as pending."""
+        now = time.time()
+        self.conn.executemany("""
+            INSERT INTO crawl_frontier (puuid, times_seen, discovered_at) VALUES (?, 1, ?)
+            ON CONFLICT (puuid) DO UPDATE SET times_seen = times_seen + 1
+        """, [(puuid, now) for puuid in puuids])
+
+    def claim(self):
+        """Return the highest-priority pending PUUID not already claimed or deferred, or None if there is none."""
+        rows = self.conn.execute(
+            f"SELECT puuid FROM crawl_frontier WHERE status = 'pending' ORDER BY {self.order} LIMIT ?",
+            (len(self._claimed) + len(self._deferred) + 1,)
+        ).fetchall()
+        for (puuid,) in rows:
+            if puuid not in self._claimed and puuid not in self._deferred:
+                self._claimed.add(puuid)
+                return puuid
+        return None
+
+    def mark_done(self, puuid):
+        """Checkpoint a PUUID whose match-ID list has been fully processed."""
+        self.conn.execute("UPDATE crawl_frontier SET status = 'done', crawled_at = ? WHERE puuid = ?", (time.time(), puuid))
+        self._claimed.discard(puuid)
+
+    def release(self, puuid, retry_later=False):
+        """Give a claimed PUUID back to the frontier without marking it done.
+
+        With retry_later=True (its match-ID list could not be fetched) it is not claimed again by
+        this frontier, so a failing PUUID is not retried in a loop; it stays pending for the next crawl.
+        """
+        self._claimed.discard(puuid)
+        if retry_later:
+            self._deferred.add(puuid)
+
+    def pending_count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM crawl_frontier WHERE status = 'pending'").fetchone()[0]
+
+    def done_count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM crawl_frontier WHERE status = 'done'").fetchone()[0]
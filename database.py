@@ -1,6 +1,24 @@
+import ast
+import json
 import sqlite3
+import time
 from pathlib import Path
-from config import DB_PATH
+from seen_match_ids import SeenMatchIds
+from metrics import metrics
+from config import DB_PATH, DB_V2_PATH, CHAMPIONS_JSON_PATH, WRITE_BATCH_SIZE, WRITE_FLUSH_SECONDS
+
+INSERT_MATCHUP_QUERY = """
+    INSERT OR IGNORE INTO matchups (
+        match_id, lane, puuid, champion, winner, primary_style, primary_selections,
+        sub_style, sub_selections, stat_perks, items, summoner_spells, team_bans,
+        game_version, game_creation
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+# Columns added after the first release, with their types; setup_database adds them to older tables
+ADDED_MATCHUP_COLUMNS = {
+    'game_version': 'TEXT',  # info.gameVersion, e.g. '14.3.558.1234'
+    'game_creation': 'INTEGER',  # info.gameCreation, milliseconds since the epoch
+}
 
 def setup_database(db_path=DB_PATH):
     db_path.parent.mkdir(exist_ok=True)
@@ -21,40 +39,292 @@ def setup_database(db_path=DB_PATH):
             items TEXT,
             summoner_spells TEXT,
             team_bans TEXT,
+            game_version TEXT,
+            game_creation INTEGER,
             PRIMARY KEY (match_id, puuid)
         )
     """)
-    conn.commit()
+    add_matchup_columns(conn)
     conn.close()
 
+def add_matchup_columns(conn):
+    """Add the ADDED_MATCHUP_COLUMNS missing from an existing matchups table; rows keep NULL in them."""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(matchups)")}
+    if not existing:
+        return
+    for column, column_type in ADDED_MATCHUP_COLUMNS.items():
+        if column not in existing:
+            conn.execute(f"ALTER TABLE matchups ADD COLUMN {column} {column_type}")
+    conn.commit()
+
+def _matchup_rows(player_data):
+    return [(
+        row['match_id'], row['lane'], row['puuid'], row['champion'], row['winner'],
+        row['primary_style'], row['primary_selections'], row['sub_style'],
+        row['sub_selections'], row['stat_perks'], row['items'],
+        row['summoner_spells'], row['team_bans'],
+        row.get('game_version'), row.get('game_creation')
+    ) for row in player_data]
+
 def save_to_database(player_data, db_path=DB_PATH):
     conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    query = """
-        INSERT OR IGNORE INTO matchups (
-            match_id, lane, puuid, champion, winner, primary_style, primary_selections,
-            sub_style, sub_selections, stat_perks, items, summoner_spells, team_bans
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """
-    for row in player_data:
-        cursor.execute(query, (
-            row['match_id'], row['lane'], row['puuid'], row['champion'], row['winner'],
-            row['primary_style'], row['primary_selections'], row['sub_style'],
-            row['sub_selections'], row['stat_perks'], row['items'],
-            row['summoner_spells'], row['team_bans']
-        ))
+    conn.executemany(INSERT_MATCHUP_QUERY, _matchup_rows(player_data))
     conn.commit()
     conn.close()
     print(f"Saved {len(player_data)} rows to database")
 
+class MatchWriter:
+    """Long-lived matchups writer that batches matches into WAL-mode transactions.
+
+    Durability: a match is durable only once the transaction holding it commits, which happens
+    when `batch_size` matches are buffered, when a write arrives `flush_interval` seconds after
+    the last commit, or on flush()/close(). A crash therefore loses at most the unflushed buffer;
+    those matches are simply re-crawled since their IDs were never stored. With the default
+    synchronous=NORMAL, committed transactions survive an application crash, but a power loss
+    may roll back the last few commits (never corrupting the file); pass synchronous='FULL' to
+    fsync every commit.
+    """
+    def __init__(self, db_path=DB_PATH, batch_size=WRITE_BATCH_SIZE, flush_interval=WRITE_FLUSH_SECONDS, synchronous='NORMAL'):
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(f"PRAGMA synchronous={synchronous}")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._rows = []
+        self._buffered_matches = 0
+        self._last_flush = time.monotonic()
+
+    def write(self, player_data):
+        """Buffer one match's player rows, committing the batch when it is full or old enough."""
+        self._rows.extend(_matchup_rows(player_data))
+        self._buffered_matches += 1
+        if self._buffered_matches >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Commit all buffered matches, and anything else pending on the connection, in one transaction."""
+        start = time.perf_counter()
+        with self.conn:
+            if self._rows:
+                self.conn.executemany(INSERT_MATCHUP_QUERY, self._rows)
+        if self._rows:
+            metrics.observe('db_write_batch_seconds', time.perf_counter() - start)
+            metrics.inc('db_matches_written_total', self._buffered_matches)
+            print(f"Saved {self._buffered_matches} matches ({len(self._rows)} rows) to database")
+        self._rows = []
+        self._buffered_matches = 0
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+# v2 schema: integer dimension tables and typed columns instead of str() reprs of lists/dicts.
+# Champions use Riot's numeric champion key; item and ban lists live in indexed child tables.
+V2_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS champions (
+        champion_id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS lanes (
+        lane_id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS matches (
+        match_pk INTEGER PRIMARY KEY,
+        match_id TEXT NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS players (
+        player_pk INTEGER PRIMARY KEY,
+        puuid TEXT NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS participants (
+        participant_pk INTEGER PRIMARY KEY,
+        match_pk INTEGER NOT NULL REFERENCES matches (match_pk),
+        player_pk INTEGER NOT NULL REFERENCES players (player_pk),
+        champion_id INTEGER NOT NULL REFERENCES champions (champion_id),
+        lane_id INTEGER NOT NULL REFERENCES lanes (lane_id),
+        winner INTEGER NOT NULL,
+        primary_style INTEGER,
+        keystone INTEGER,
+        primary_perk1 INTEGER,
+        primary_perk2 INTEGER,
+        primary_perk3 INTEGER,
+        sub_style INTEGER,
+        sub_perk0 INTEGER,
+        sub_perk1 INTEGER,
+        stat_offense INTEGER,
+        stat_flex INTEGER,
+        stat_defense INTEGER,
+        summoner1_id INTEGER,
+        summoner2_id INTEGER,
+        UNIQUE (match_pk, player_pk)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS participant_items (
+        participant_pk INTEGER NOT NULL REFERENCES participants (participant_pk),
+        slot INTEGER NOT NULL,
+        item_id INTEGER NOT NULL,
+        PRIMARY KEY (participant_pk, slot)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS match_bans (
+        match_pk INTEGER NOT NULL REFERENCES matches (match_pk),
+        winner INTEGER NOT NULL,
+        slot INTEGER NOT NULL,
+        champion_id INTEGER NOT NULL,
+        PRIMARY KEY (match_pk, winner, slot)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_participants_champion_lane ON participants (champion_id, lane_id, winner)",
+    "CREATE INDEX IF NOT EXISTS idx_participants_keystone ON participants (keystone, champion_id, lane_id)",
+    "CREATE INDEX IF NOT EXISTS idx_participant_items_item ON participant_items (item_id, participant_pk)",
+    "CREATE INDEX IF NOT EXISTS idx_match_bans_champion ON match_bans (champion_id)",
+]
+
+def setup_database_v2(db_path=DB_V2_PATH, champions_path=CHAMPIONS_JSON_PATH):
+    db_path.parent.mkdir(exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    for statement in V2_SCHEMA:
+        conn.execute(statement)
+    with open(champions_path, 'r', encoding='utf-8') as file:
+        champions = json.load(file)['data'].values()
+    conn.executemany(
+        "INSERT OR IGNORE INTO champions (champion_id, name) VALUES (?, ?)",
+        [(int(champ['key']), champ['id']) for champ in champions]
+    )
+    conn.commit()
+    conn.close()
+
+def _parse(value):
+    """Decode a v1 str() repr (items, runes, spells, bans); typed values pass through."""
+    return ast.literal_eval(value) if isinstance(value, str) else value
+
+class NormalizedMatchStore:
+    """Writes and queries the v2 schema created by setup_database_v2."""
+    def __init__(self, db_path=DB_V2_PATH):
+        self.conn = sqlite3.connect(db_path)
+        self._ids = {
+            'champions': dict(self.conn.execute("SELECT name, champion_id FROM champions")),
+            'lanes': dict(self.conn.execute("SELECT name, lane_id FROM lanes")),
+            'players': {}
+        }
+
+    def _dimension_id(self, table, value):
+        ids = self._ids[table]
+        if value not in ids:
+            if table == 'players':
+                self.conn.execute("INSERT OR IGNORE INTO players (puuid) VALUES (?)", (value,))
+                ids[value] = self.conn.execute("SELECT player_pk FROM players WHERE puuid = ?", (value,)).fetchone()[0]
+            elif table == 'champions':
+                # Not in the static catalog yet (new release): park it above Riot's key range
+                next_id = self.conn.execute("SELECT MAX(MAX(champion_id) + 1, 100000) FROM champions").fetchone()[0]
+                self.conn.execute("INSERT INTO champions (champion_id, name) VALUES (?, ?)", (next_id, value))
+                ids[value] = next_id
+            else:
+                ids[value] = self.conn.execute("INSERT INTO lanes (name) VALUES (?)", (value,)).lastrowid
+        return ids[value]
+
+    def insert_match(self, player_data):
+        """Insert one match given its player rows (as produced by api.extract_player_data).
+
+        Returns False if the match is already stored. Not committed here.
+        """
+        match_id = player_data[0]['match_id']
+        cursor = self.conn.execute("INSERT OR IGNORE INTO matches (match_id) VALUES (?)", (match_id,))
+        if cursor.rowcount == 0:
+            return False
+        match_pk = cursor.lastrowid
+
+        bans = {}
+        for row in player_data:
+            primary = _parse(row['primary_selections'])
+            sub = _parse(row['sub_selections'])
+            stat_perks = _parse(row['stat_perks'])
+            spells = _parse(row['summoner_spells'])
+            participant_pk = self.conn.execute("""
+                INSERT INTO participants (
+                    match_pk, player_pk, champion_id, lane_id, winner, primary_style, keystone,
+                    primary_perk1, primary_perk2, primary_perk3, sub_style, sub_perk0, sub_perk1,
+                    stat_offense, stat_flex, stat_defense, summoner1_id, summoner2_id
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                match_pk, self._dimension_id('players', row['puuid']),
+                self._dimension_id('champions', row['champion']), self._dimension_id('lanes', row['lane']),
+                row['winner'], row['primary_style'], *(primary + [None] * 4)[:4],
+                row['sub_style'], *(sub + [None] * 2)[:2],
+                stat_perks.get('offense'), stat_perks.get('flex'), stat_perks.get('defense'),
+                spells['summoner1Id'], spells['summoner2Id']
+            )).lastrowid
+            items = _parse(row['items'])
+            self.conn.executemany(
+                "INSERT INTO participant_items (participant_pk, slot, item_id) VALUES (?, ?, ?)",
+                [(participant_pk, int(slot[len('item'):]), item_id) for slot, item_id in items.items() if item_id]
+            )
+            bans.setdefault(row['winner'], _parse(row['team_bans']))
+
+        self.conn.executemany(
+            "INSERT INTO match_bans (match_pk, winner, slot, champion_id) VALUES (?, ?, ?, ?)",
+            [(match_pk, winner, slot, champion_id) for winner, team_bans in bans.items() for slot, champion_id in enumerate(team_bans)]
+        )
+        return True
+
+    def item_win_rates(self, champion, lane, min_matches=1):
+        """Per-item wins and games for a champion in a lane, most played first."""
+        return self.conn.execute("""
+            SELECT i.item_id, SUM(p.winner) AS wins, COUNT(*) AS total_matches
+            FROM participants AS p
+            JOIN participant_items AS i ON i.participant_pk = p.participant_pk
+            WHERE p.champion_id = (SELECT champion_id FROM champions WHERE name = ?)
+              AND p.lane_id = (SELECT lane_id FROM lanes WHERE name = ?)
+            GROUP BY i.item_id
+            HAVING COUNT(*) >= ?
+            ORDER BY total_matches DESC
+        """, (champion, lane, min_matches)).fetchall()
+
+    def keystone_win_rates(self, champion, lane, min_matches=1):
+        """Per-keystone wins and games for a champion in a lane, most played first."""
+        return self.conn.execute("""
+            SELECT keystone, SUM(winner) AS wins, COUNT(*) AS total_matches
+            FROM participants
+            WHERE champion_id = (SELECT champion_id FROM champions WHERE name = ?)
+              AND lane_id = (SELECT lane_id FROM lanes WHERE name = ?)
+            GROUP BY keystone
+            HAVING COUNT(*) >= ?
+            ORDER BY total_matches DESC
+        """, (champion, lane, min_matches)).fetchall()
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
 def load_existing_match_ids(db_path=DB_PATH):
+    """Return the match IDs already stored in matchups as a compact SeenMatchIds set."""
     if not db_path.exists():
         setup_database(db_path)
-        return set()
+        return SeenMatchIds()
     conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("SELECT DISTINCT match_id FROM matchups")
-    match_ids = set(row[0] for row in cursor.fetchall())
+    match_ids = SeenMatchIds.from_connection(conn)
     conn.close()
     return match_ids
 
@@ -1,12 +1,51 @@
-import requests
 from api import get_match_ids, get_match_details, extract_player_data, RateLimitExceeded
-from database import setup_database, save_to_database, load_existing_match_ids
-from config import REGION, HEADERS, MAX_MATCHES, REMAKE_THRESHOLD, RANKED_SOLO_DUO_QUEUE_ID, DB_PATH
+from database import setup_database, save_to_database, load_existing_match_ids, MatchWriter
+from http_client import riot_session
+from match_archive import MatchArchive
+from crawl_frontier import CrawlFrontier
+from metrics import metrics
+from config import (REGION, HEADERS, MAX_MATCHES, REMAKE_THRESHOLD, RANKED_SOLO_DUO_QUEUE_ID, DB_PATH, ARCHIVE_PATH,
+                    CRAWLER_STATS_PATH)
 
-def extract_matches_data(puuid, all_match_ids, all_puuids, db_path):
+def process_match_details(match_id, match_details):
+    """Validate a match payload and return its 10 player rows, or None if it should be skipped."""
+    if not match_details or match_details['info']['queueId'] != RANKED_SOLO_DUO_QUEUE_ID:
+        print(f"Skipping match ID {match_id} (not Ranked Solo/Duo or error)")
+        metrics.inc('crawler_matches_skipped_total', reason='queue_or_error')
+        return None
+
+    if match_details['info']['gameDuration'] < REMAKE_THRESHOLD:
+        print(f"Skipping match ID {match_id} (remade, duration: {match_details['info']['gameDuration']}s)")
+        metrics.inc('crawler_matches_skipped_total', reason='remake')
+        return None
+
+    player_data = extract_player_data(match_details, match_id)
+    if len(player_data) != 10:
+        print(f"Skipping match ID {match_id} (incomplete data: {len(player_data)} players)")
+        metrics.inc('crawler_matches_skipped_total', reason='incomplete')
+        return None
+
+    lanes = [player['lane'] for player in player_data]
+    if 'Invalid' in lanes:
+        print(f"Skipping match ID {match_id} (contains 'Invalid' lane)")
+        metrics.inc('crawler_matches_skipped_total', reason='invalid_lane')
+        return None
+
+    return player_data
+
+def extract_matches_data(puuid, all_match_ids, db_path, writer=None, archive=None, frontier=None):
+    """Store the new matches of a PUUID's history and return all_match_ids with them added.
+
+    With a frontier, the players met along the way are added to it, and the (claimed) PUUID is
+    marked done once its matches were handed to the writer, or released back to pending if its
+    match-ID list could not be fetched.
+    """
     match_ids = get_match_ids(puuid)
-    if not match_ids:
-        return all_match_ids, all_puuids
+    if match_ids is None:
+        print(f"Could not fetch match IDs for {puuid}; leaving it pending")
+        if frontier is not None:
+            frontier.release(puuid, retry_later=True)
+        return all_match_ids
 
     print(f"Ranked Solo/Duo Match IDs: {match_ids}")
     for match_id in match_ids:
@@ -15,37 +54,29 @@ def extract_matches_data(puuid, all_match_ids, all_puuids, db_path):
             continue
 
         match_details = get_match_details(match_id)
-        if not match_details or match_details['info']['queueId'] != RANKED_SOLO_DUO_QUEUE_ID:
-            print(f"Skipping match ID {match_id} (not Ranked Solo/Duo or error)")
-            continue
-
-        if match_details['info']['gameDuration'] < REMAKE_THRESHOLD:
-            print(f"Skipping match ID {match_id} (remade, duration: {match_details['info']['gameDuration']}s)")
+        if match_details and archive is not None:
+            archive.append(match_id, match_details)
+        player_data = process_match_details(match_id, match_details)
+        if player_data is None:
             continue
 
-        player_data = extract_player_data(match_details, match_id)
-        if len(player_data) != 10:
-            print(f"Skipping match ID {match_id} (incomplete data: {len(player_data)} players)")
-            continue
-        
-        lanes = [player['lane'] for player in player_data]
-        if 'Invalid' in lanes:
-            print(f"Skipping match ID {match_id} (contains 'Invalid' lane)")
-            continue
-
-        save_to_database(player_data, db_path)
+        if frontier is not None:
+            frontier.add(player['puuid'] for player in player_data)
+        if writer is not None:
+            writer.write(player_data)
+        else:
+            save_to_database(player_data, db_path)
         all_match_ids.add(match_id)
-        for player in player_data:
-            all_puuids.add(player['puuid'])
+        metrics.inc('crawler_matches_processed_total')
         print(f"Processed match: {match_id}")
 
-    return all_match_ids, all_puuids
+    if frontier is not None:
+        frontier.mark_done(puuid)
+    return all_match_ids
 
 def extract_ranked_solo_duo_data(riot_id):
     setup_database()
     all_match_ids = load_existing_match_ids()
-    all_puuids = set()
-    processed_puuids = set()
 
     try:
         game_name, tag_line = riot_id.split('/')
@@ -53,31 +84,40 @@ def extract_ranked_solo_duo_data(riot_id):
         print(f"Invalid riot_id format: {riot_id}. Expected 'gameName/tagLine' (e.g., 'AkemiMoon8/NA1')")
         return
 
-    url = f"https://{REGION}.api.riotgames.com/riot/account/v1/accounts/by-riot-id/{game_name}/{tag_line}"
-    print(f"Requesting PUUID from: {url}")
-    response = requests.get(url, headers=HEADERS)
-    if response.status_code != 200:
-        print(f"API Error: {response.status_code} - {response.text}")
-        response.raise_for_status()
-        return
+    try:
+        with MatchWriter(DB_PATH) as writer, MatchArchive(ARCHIVE_PATH) as archive:
+            frontier = CrawlFrontier(writer.conn)
+            pending = frontier.pending_count()
+            if pending:
+                print(f"Resuming crawl: {pending} pending PUUIDs, {frontier.done_count()} already processed")
+            else:
+                url = f"https://{REGION}.api.riotgames.com/riot/account/v1/accounts/by-riot-id/{game_name}/{tag_line}"
+                print(f"Requesting PUUID from: {url}")
+                response = riot_session.get(url, "account", headers=HEADERS)
+                if response.status_code != 200:
+                    print(f"API Error: {response.status_code} - {response.text}")
+                    response.raise_for_status()
+                    return
 
-    puuid = response.json()['puuid']
-    print(f"Initial PUUID: {puuid}")
-    all_puuids.add(puuid)
+                puuid = response.json()['puuid']
+                print(f"Initial PUUID: {puuid}")
+                frontier.add([puuid])
 
-    try:
-        while len(all_match_ids) < MAX_MATCHES and all_puuids:
-            current_puuid = all_puuids.pop()
-            if current_puuid in processed_puuids:
-                continue
-
-            all_match_ids, all_puuids = extract_matches_data(current_puuid, all_match_ids, all_puuids, DB_PATH)
-            processed_puuids.add(current_puuid)
-            print(f"Total unique matches processed: {len(all_match_ids)}\n")
+            while len(all_match_ids) < MAX_MATCHES:
+                current_puuid = frontier.claim()
+                if current_puuid is None:
+                    print("Crawl frontier exhausted")
+                    break
+
+                all_match_ids = extract_matches_data(current_puuid, all_match_ids, DB_PATH, writer, archive, frontier)
+                print(f"Total unique matches processed: {len(all_match_ids)}\n")
     except RateLimitExceeded as e:
         print(f"Stopping data extraction: {e}")
         print(f"Collected {len(all_match_ids)} matches before hitting persistent rate limit")
         return
+    finally:
+        print(f"HTTP stats: {riot_session.stats()}")
+        metrics.write_json(CRAWLER_STATS_PATH)
 
 if __name__ == "__main__":
     extract_ranked_solo_duo_data("Ballas/5555")
\ No newline at end of file
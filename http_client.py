@@ -0,0 +1,75 @@
+import time
+from collections import defaultdict
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from metrics import metrics
+from config import HEADERS, HTTP_POOL_SIZE, HTTP_MAX_RETRIES, HTTP_BACKOFF_FACTOR, HTTP_TIMEOUTS, HTTP_DEFAULT_TIMEOUT
+
+class RiotSession:
+    """Shared keep-alive session for synchronous Riot API calls.
+
+    Pools connections per host, retries connection errors and 5xx responses with exponential
+    backoff, applies per-endpoint timeouts and keeps latency and connection counters.
+    """
+    def __init__(self, headers=HEADERS, pool_size=HTTP_POOL_SIZE, max_retries=HTTP_MAX_RETRIES,
+                 backoff_factor=HTTP_BACKOFF_FACTOR, timeouts=HTTP_TIMEOUTS, default_timeout=HTTP_DEFAULT_TIMEOUT):
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=[500, 502, 503, 504],
+            allowed_methods=["GET"],
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.timeouts = timeouts
+        self.default_timeout = default_timeout
+        self.request_count = defaultdict(int)
+        self.latency_seconds = defaultdict(float)
+
+    def get(self, url, endpoint=None, **kwargs):
+        """GET through the pool; `endpoint` selects the timeout and the counters bucket."""
+        kwargs.setdefault("timeout", self.timeouts.get(endpoint, self.default_timeout))
+        start = time.perf_counter()
+        status = None
+        try:
+            response = self.session.get(url, **kwargs)
+            status = response.status_code
+            return response
+        finally:
+            elapsed = time.perf_counter() - start
+            self.request_count[endpoint] += 1
+            self.latency_seconds[endpoint] += elapsed
+            metrics.observe('riot_api_request_seconds', elapsed, endpoint=endpoint)
+            if status is None:
+                metrics.inc('riot_api_transport_errors_total', endpoint=endpoint)
+            else:
+                metrics.inc('riot_api_responses_total', endpoint=endpoint, status=status)
+
+    def connection_count(self):
+        """Number of TCP/TLS connections opened by the currently pooled hosts."""
+        count = 0
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                count += pools[key].num_connections
+        return count
+
+    def stats(self):
+        """Per-endpoint request counts and mean latency, plus connections opened."""
+        return {
+            "connections_opened": self.connection_count(),
+            "endpoints": {
+                endpoint: {
+                    "requests": count,
+                    "mean_latency_ms": 1000 * self.latency_seconds[endpoint] / count
+                }
+                for endpoint, count in self.request_count.items()
+            }
+        }
+
+riot_session = RiotSession()
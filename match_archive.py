@@ -0,0 +1,136 @@
+import argparse
+import json
+import mmap
+import sqlite3
+import time
+import zlib
+from multiprocessing import Pool, cpu_count
+from pathlib import Path
+from database import setup_database, MatchWriter
+from config import ARCHIVE_PATH, DB_PATH
+
+def _index_path(archive_path):
+    return archive_path.with_suffix('.idx.db')
+
+class MatchArchive:
+    """Append-only archive of raw get_match_details payloads.
+
+    Each payload is stored as one zlib-compressed JSON frame in the archive file, and a SQLite
+    index next to it maps match_id -> (offset, length). The index is committed after the frames
+    it points to are flushed, so on reopen any tail written after the last index commit (e.g. by
+    a crash) is truncated away and those matches are simply archived again when re-crawled.
+    """
+    def __init__(self, archive_path=ARCHIVE_PATH, commit_every=100):
+        self.archive_path = Path(archive_path)
+        self.archive_path.parent.mkdir(exist_ok=True)
+        self.index = sqlite3.connect(_index_path(self.archive_path))
+        self.index.execute("""
+            CREATE TABLE IF NOT EXISTS frames (
+                match_id TEXT PRIMARY KEY,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL
+            )
+        """)
+        self.index.commit()
+        end = self.index.execute("SELECT COALESCE(MAX(offset + length), 0) FROM frames").fetchone()[0]
+        self.file = open(self.archive_path, 'ab')
+        if self.file.tell() > end:
+            self.file.truncate(end)
+            self.file.seek(0, 2)  # tell() still reports the size from before the cut
+        elif self.file.tell() < end:
+            # Frames lost below the index (OS crash before the data reached disk): forget them
+            self.index.execute("DELETE FROM frames WHERE offset + length > ?", (self.file.tell(),))
+            self.index.commit()
+        self.offset = self.file.tell()
+        self.commit_every = commit_every
+        self._uncommitted = 0
+
+    def __contains__(self, match_id):
+        return self.index.execute("SELECT 1 FROM frames WHERE match_id = ?", (match_id,)).fetchone() is not None
+
+    def append(self, match_id, payload):
+        """Archive a raw match payload (a no-op if match_id is already archived)."""
+        if match_id in self:
+            return
+        frame = zlib.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'), 6)
+        self.file.write(frame)
+        self.index.execute("INSERT INTO frames (match_id, offset, length) VALUES (?, ?, ?)", (match_id, self.offset, len(frame)))
+        self.offset += len(frame)
+        self._uncommitted += 1
+        if self._uncommitted >= self.commit_every:
+            self.flush()
+
+    def flush(self):
+        """Flush appended frames to the OS, then commit the index entries pointing at them."""
+        self.file.flush()
+        self.index.commit()
+        self._uncommitted = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def read_frame(buffer, offset, length):
+    """Decode one frame from a bytes-like view of the archive (e.g. an mmap)."""
+    return json.loads(zlib.decompress(buffer[offset:offset + length]))
+
+def load_payload(match_id, archive_path=ARCHIVE_PATH):
+    """Return the archived raw payload for match_id, or None if it was never archived."""
+    archive_path = Path(archive_path)
+    index = sqlite3.connect(_index_path(archive_path))
+    frame = index.execute("SELECT offset, length FROM frames WHERE match_id = ?", (match_id,)).fetchone()
+    index.close()
+    if frame is None:
+        return None
+    with open(archive_path, 'rb') as file:
+        file.seek(frame[0])
+        return json.loads(zlib.decompress(file.read(frame[1])))
+
+_archive_view = None
+
+def _open_view(archive_path):
+    global _archive_view
+    with open(archive_path, 'rb') as file:
+        _archive_view = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+def _extract_frame(frame):
+    """Worker: decode one frame from the shared read-only mmap and re-run the extraction."""
+    from extract_data import process_match_details  # extract_data imports this module
+    match_id, offset, length = frame
+    return process_match_details(match_id, read_frame(_archive_view, offset, length))
+
+def replay_archive(archive_path=ARCHIVE_PATH, db_path=DB_PATH, processes=None):
+    """Rebuild matchups offline by re-running extract_player_data over every archived payload."""
+    archive_path, db_path = Path(archive_path), Path(db_path)
+    index = sqlite3.connect(_index_path(archive_path))
+    frames = index.execute("SELECT match_id, offset, length FROM frames ORDER BY offset").fetchall()
+    index.close()
+    if not frames:
+        print(f"No archived matches in {archive_path}")
+        return 0
+
+    setup_database(db_path)
+    start = time.perf_counter()
+    replayed = 0
+    with Pool(processes or cpu_count(), initializer=_open_view, initargs=(archive_path,)) as pool, MatchWriter(db_path, batch_size=1000) as writer:
+        for player_data in pool.imap_unordered(_extract_frame, frames, chunksize=64):
+            if player_data is not None:
+                writer.write(player_data)
+                replayed += 1
+    print(f"Replayed {replayed}/{len(frames)} archived matches into {db_path} in {time.perf_counter() - start:.1f}s")
+    return replayed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild matchups from the raw match payload archive")
+    parser.add_argument('--archive', type=Path, default=ARCHIVE_PATH)
+    parser.add_argument('--db', type=Path, default=DB_PATH)
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+    replay_archive(args.archive, args.db, args.processes)
@@ -1,73 +1,585 @@
+from collections import OrderedDict
+from itertools import combinations
 from pathlib import Path
+import math
+import os
 import sqlite3
+import threading
+import time
 import pandas as pd
-from collections import defaultdict, Counter
-from mlxtend.frequent_patterns import apriori, association_rules
-from mlxtend.preprocessing import TransactionEncoder
-from config import DB_PATH
+from pandas.api.types import union_categoricals
+from config import DB_PATH, REBUILD_PROFILE_PATH, WIN_RATE_INTERVAL_METHOD
+from database import add_matchup_columns
+from response_cache import ResponseCache
+from metrics import metrics, profiled
+from win_rate_matrix import matrix_path, matrix_signature, read_matrix, write_matrix
+from build_stats import BUILD_CHUNK_ROWS, BUILD_COLUMNS, BUILD_KINDS, count_builds
+from win_rate_intervals import Z, interval_sd, win_rate_interval, wilson_interval
 import numpy as np
-from multiprocessing import Pool, cpu_count
-
-def _process_match(row):
-    """Helper function for parallel processing of match data to calculate win rates."""
-    champions = row['champion']
-    lanes = row['lane']
-    winners = [champ for champ, win in zip(champions, row['winner']) if win == 1]
-    losers = [champ for champ, win in zip(champions, row['winner']) if win == 0]
-    wins = defaultdict(int)
-    total = defaultdict(int)
-    # Matchup win rates (same-lane opponents)
-    for idx, X in enumerate(winners):
-        lane_X = lanes[idx]
-        for jdx, Y in enumerate(losers):
-            lane_Y = lanes[jdx]
-            if lane_X == lane_Y:
-                wins[(X, Y, lane_X)] += 1
-                total[(X, Y, lane_X)] += 1
-    for idx, X in enumerate(losers):
-        lane_X = lanes[idx]
-        for jdx, Y in enumerate(winners):
-            lane_Y = lanes[jdx]
-            if lane_X == lane_Y:
-                total[(X, Y, lane_X)] += 1
-    # Per-champion-lane win rates
-    for idx, champ in enumerate(champions):
-        lane = lanes[idx]
-        win = row['winner'][idx]
-        key = (champ, None, lane)  # None opponent for overall win rate
-        total[key] += 1
-        if win == 1:
-            wins[key] += 1
-    return wins, total
+
+PRIOR_WIN_RATE = 0.5  # Neutral prior (50%)
+PRIOR_WEIGHT = 10     # Equivalent to 10 matches
+RULES_REFRESH_FRACTION = 0.05  # Rebuild rules once new matches exceed 5% of those they were mined from
+ALLY_SUGGESTION_LIMIT = 5
+SYNERGY_WEIGHT = 10.0  # Win rate points per unit of mean ally lift above 1 when ranking picks
+TWO_PLY_BEAM = 20  # Best one-ply candidates re-scored against the enemy's counter-picks
+TWO_PLY_RESPONSES = 40  # Most-played champions in the lane considered as enemy counter-picks
+TWO_PLY_MIN_MATCHES = 20  # Games a matchup needs before its reply counts as a counter-pick
+DENSE_KEY_LIMIT = 1 << 22  # Largest key space counted with dense bincounts
+DAY_MS = 86_400_000
+WINDOW_KINDS = ('patches', 'days', 'half_life')
+READ_CHUNK_ROWS = 500_000  # matchups rows fetched as Python tuples at a time
+BUCKET_WRITE_CHUNK = 500_000  # win_rate_buckets rows converted and inserted at a time
+BUILD_MIN_MATCHES = 10  # Builds played fewer times are left out of top_builds
+WINDOW_CACHE_SIZE = 16  # Windowed win rate indexes kept per analyzer
+DECAY_HORIZON_HALF_LIVES = 8  # half_life windows skip days older than this (weight below 0.4%)
+NEUTRAL_INTERVAL = tuple(float(bound) for bound in wilson_interval(0, 0, PRIOR_WEIGHT, PRIOR_WIN_RATE))  # Served with the neutral 50%
+
+def _count_keys(keys, wins, size):
+    """Distinct flat keys in ascending order with their win and game counts.
+
+    Small key spaces use dense bincounts; large ones (per-bucket counts) are compacted first.
+    """
+    if size <= DENSE_KEY_LIMIT:
+        total = np.bincount(keys, minlength=size)
+        win = np.bincount(keys, weights=wins, minlength=size).astype(np.int64)
+        present = np.flatnonzero(total)
+        return present, win[present], total[present]
+    codes, present = pd.factorize(keys, sort=True)
+    return present, np.bincount(codes, weights=wins).astype(np.int64), np.bincount(codes)
+
+def _aggregate_win_counts(df, by=()):
+    """Count wins and games per (champion, opponent, lane) with grouped NumPy reductions.
+
+    Champions, lanes and matches are integer-coded so lane matchups and per-champion-lane
+    baselines reduce to bincounts over flat keys. Opponents are paired on the participant's
+    own lane; baseline rows carry a None opponent. With `by` columns (constant within a match,
+    e.g. patch and day) the counts are split per combination of their values, NaN included,
+    and those columns lead the output.
+    """
+    champ_codes, champ_names = pd.factorize(df['champion'])
+    lane_codes, lane_names = pd.factorize(df['lane'])
+    match_codes, _ = pd.factorize(df['match_id'])
+    winner = df['winner'].to_numpy(dtype=np.int64)
+    n_champs, n_lanes = len(champ_names), len(lane_names)
+    group_codes = np.zeros(len(df), dtype=np.int64)
+    levels = []
+    for column in by:
+        codes, names = pd.factorize(df[column], use_na_sentinel=False)
+        group_codes = group_codes * len(names) + codes
+        levels.append(names)
+    group_codes, group_keys = pd.factorize(group_codes, sort=True)
+    n_groups = max(len(group_keys), 1)
+
+    # Lane matchups: every participant against the other team's players in the same lane
+    participants = pd.DataFrame({'match': match_codes, 'lane': lane_codes, 'champ': champ_codes, 'winner': winner, 'group': group_codes})
+    pairs = participants.merge(participants.drop(columns='group'), on=['match', 'lane'], suffixes=('', '_opp'))
+    pairs = pairs[pairs['winner'] != pairs['winner_opp']]
+    pair_keys = ((pairs['group'].to_numpy() * n_champs + pairs['champ'].to_numpy()) * n_champs + pairs['champ_opp'].to_numpy()) * n_lanes + pairs['lane'].to_numpy()
+    keys, wins, total = _count_keys(pair_keys, pairs['winner'].to_numpy(), n_groups * n_champs * n_champs * n_lanes)
+    matchups = pd.DataFrame({
+        'group': keys // (n_champs * n_champs * n_lanes),
+        'champion': champ_names.take(keys // (n_champs * n_lanes) % n_champs),
+        'opponent': champ_names.take(keys // n_lanes % n_champs),
+        'lane': lane_names.take(keys % n_lanes),
+        'wins': wins,
+        'total_matches': total
+    })
+
+    # Per-champion-lane baselines
+    base_keys = (group_codes * n_champs + champ_codes) * n_lanes + lane_codes
+    keys, wins, total = _count_keys(base_keys, winner, n_groups * n_champs * n_lanes)
+    baselines = pd.DataFrame({
+        'group': keys // (n_champs * n_lanes),
+        'champion': champ_names.take(keys // n_lanes % n_champs),
+        'opponent': None,
+        'lane': lane_names.take(keys % n_lanes),
+        'wins': wins,
+        'total_matches': total
+    })
+    counts = pd.concat([matchups, baselines], ignore_index=True)
+    group = group_keys.take(counts.pop('group').to_numpy())
+    for column, names in reversed(list(zip(by, levels))):
+        counts.insert(0, column, names.take(group % len(names)))
+        group = group // len(names)
+    return counts
+
+def _sum_buckets(counts):
+    """Collapse per-bucket counts from _aggregate_win_counts(df, by=...) into all-time counts.
+
+    The champion and lane columns are categorical; observed=True keeps only the keys that occur
+    rather than every champion x opponent x lane combination (pandas < 3 defaults to all of them).
+    """
+    return counts.groupby(['champion', 'opponent', 'lane'], dropna=False, sort=False, observed=True)[['wins', 'total_matches']].sum().reset_index()
+
+def _known_buckets(counts):
+    """Rows of per-(patch, day) counts whose patch and day are known, as stored in win_rate_buckets."""
+    known = counts[counts['patch'].notna() & counts['day'].notna()]
+    return known.astype({'patch': str, 'day': np.int64})
+
+def _patch(game_version):
+    """'14.3.558.1234' -> '14.3'."""
+    return '.'.join(game_version.split('.')[:2])
+
+def _patch_key(patch):
+    return tuple(int(part) if part.isdigit() else -1 for part in patch.split('.'))
+
+def _with_patch(df):
+    """Replace a game_version column with a categorical patch column (NaN where unknown)."""
+    versions = df.pop('game_version').astype('category')
+    version_patches = [_patch(version) for version in versions.cat.categories]
+    patches = sorted(set(version_patches), key=_patch_key)
+    patch_codes = np.array([patches.index(patch) for patch in version_patches] + [-1], dtype=np.int64)
+    # Unknown versions have code -1, which picks the trailing -1
+    df['patch'] = pd.Categorical.from_codes(patch_codes[versions.cat.codes.to_numpy()], categories=patches)
+    return df
+
+def _concat_chunks(chunks):
+    """Concatenate frames with the same columns, keeping categorical columns categorical."""
+    if len(chunks) == 1:
+        return chunks[0]
+    return pd.DataFrame({
+        column: union_categoricals([chunk[column] for chunk in chunks])
+        if isinstance(chunks[0][column].dtype, pd.CategoricalDtype)
+        else np.concatenate([chunk[column].to_numpy() for chunk in chunks])
+        for column in chunks[0].columns
+    })
+
+def _lock_exclusive(file):
+    """Block until this process holds an exclusive lock on an open lock file; closing it releases the lock.
+
+    flock on POSIX; on Windows, where fcntl does not exist, a msvcrt lock on the file's first byte.
+    """
+    if os.name == 'nt':
+        import msvcrt
+        file.seek(0)
+        while True:
+            try:
+                msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+                return
+            except OSError:
+                time.sleep(0.1)  # LK_LOCK gives up after 10 seconds; a rebuild can take longer
+    import fcntl
+    fcntl.flock(file, fcntl.LOCK_EX)
+
+def _parse_window(window):
+    """Normalize a window spec: None or 'all', 'patches:N' (last N patches), 'days:N' (the N calendar
+    days ending at the newest day with data, gaps included) or 'half_life:D' (all days, weighted by
+    0.5 ** (age in days / D)). Ages are counted from the newest day with data, not from today."""
+    if window is None or window == 'all':
+        return None
+    kind, _, value = str(window).partition(':')
+    if kind not in WINDOW_KINDS:
+        raise ValueError(f"Unknown window {window!r}, expected 'all' or one of {[kind + ':N' for kind in WINDOW_KINDS]}")
+    try:
+        value = float(value) if kind == 'half_life' else int(value)
+    except ValueError:
+        raise ValueError(f"Window {window!r} needs a number after ':'")
+    if value <= 0:
+        raise ValueError(f"Window {window!r} must be positive")
+    return kind, value
+
+def _apply_prior(counts, interval_method='wilson'):
+    """Add a Bayesian-smoothed win_rate (percent) column to a wins/total_matches frame, with the
+    bounds of its confidence interval (see win_rate_intervals.INTERVAL_METHODS)."""
+    counts = counts.copy()
+    counts['win_rate'] = (counts['wins'] + PRIOR_WEIGHT * PRIOR_WIN_RATE) / (counts['total_matches'] + PRIOR_WEIGHT) * 100
+    counts['win_rate_low'], counts['win_rate_high'] = win_rate_interval(
+        counts['wins'].to_numpy(), counts['total_matches'].to_numpy(), PRIOR_WEIGHT, PRIOR_WIN_RATE, interval_method
+    )
+    return counts
+
+def _team_interval(rates, lows, highs):
+    """Team win rate (mean over the last axis's lanes) and its confidence interval.
+
+    Each lane's standard error is read off its interval; lanes are treated as independent, so
+    the team's variance is the sum of theirs over 25.
+    """
+    rates = np.asarray(rates, dtype=np.float64)
+    team_rate = rates.mean(axis=-1)
+    team_sd = np.sqrt((interval_sd(lows, highs) ** 2).sum(axis=-1)) / rates.shape[-1]
+    return team_rate, np.clip(team_rate - Z * team_sd, 0, 100), np.clip(team_rate + Z * team_sd, 0, 100)
+
+def _winning_transactions(df):
+    """Return (champion names, {team size: (n, size) array of sorted champion codes}) for winning teams."""
+    winners = df.loc[df['winner'] == 1, ['match_id', 'champion']].drop_duplicates()
+    champ_codes, champions = pd.factorize(winners['champion'], sort=True)
+    match_codes, _ = pd.factorize(winners['match_id'])
+    order = np.lexsort((champ_codes, match_codes))
+    champ_codes = champ_codes[order]
+    team_sizes = np.bincount(match_codes)
+    starts = np.concatenate([[0], np.cumsum(team_sizes)[:-1]])
+    transactions = {
+        size: champ_codes[starts[team_sizes == size][:, None] + np.arange(size)]
+        for size in np.unique(team_sizes).tolist()
+    }
+    return np.asarray(champions, dtype=object), transactions
+
+def _count_itemsets(transactions, n_champions, level, frequent_items):
+    """Count every `level`-champion subset of the transactions made only of frequent champions.
+
+    Itemsets are packed into int64 keys in base n_champions, so counting is one np.unique.
+    """
+    keys = []
+    for size, teams in transactions.items():
+        for positions in combinations(range(size), level):
+            items = teams[:, positions]
+            items = items[frequent_items[items].all(axis=1)]
+            key = np.zeros(len(items), dtype=np.int64)
+            for column in range(level):
+                key = key * n_champions + items[:, column]
+            keys.append(key)
+    if not keys:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.unique(np.concatenate(keys), return_counts=True)
+
+def _decode_itemsets(keys, n_champions, level):
+    items = np.empty((len(keys), level), dtype=np.int64)
+    for column in range(level - 1, -1, -1):
+        keys, items[:, column] = np.divmod(keys, n_champions)
+    return items
+
+def _mine_association_rules(df, min_support, min_threshold):
+    """Single-consequent association rules over winning teams by level-wise exact itemset counting.
+
+    Teams have at most five champions, so each level counts at most C(5, level) packed keys per
+    team regardless of min_support, instead of a dense teams x champions boolean frame. Gives
+    the support, confidence and lift of mlxtend's apriori + association_rules.
+    """
+    champions, transactions = _winning_transactions(df)
+    n_transactions = sum(len(teams) for teams in transactions.values())
+    n_champions = max(len(champions), 1)
+    columns = ['antecedents', 'consequents', 'support', 'confidence', 'lift']
+    if n_transactions == 0:
+        return pd.DataFrame(columns=columns)
+
+    frequent = {}  # level -> (sorted keys, counts)
+    frequent_items = np.ones(n_champions, dtype=bool)
+    for level in range(1, max(transactions) + 1):
+        keys, counts = _count_itemsets(transactions, n_champions, level, frequent_items)
+        keep = counts / n_transactions >= min_support
+        if not keep.any():
+            break
+        frequent[level] = (keys[keep], counts[keep])
+        if level == 1:
+            frequent_items = np.zeros(n_champions, dtype=bool)
+            frequent_items[frequent[1][0]] = True
+
+    item_counts = np.zeros(n_champions, dtype=np.int64)
+    if 1 in frequent:
+        item_counts[frequent[1][0]] = frequent[1][1]
+    rules = []
+    for level in range(2, max(frequent, default=0) + 1):
+        keys, counts = frequent[level]
+        items = _decode_itemsets(keys, n_champions, level)
+        parent_keys, parent_counts = frequent[level - 1]
+        for consequent_column in range(level):
+            antecedent_items = np.delete(items, consequent_column, axis=1)
+            antecedent_keys = np.zeros(len(keys), dtype=np.int64)
+            for column in range(level - 1):
+                antecedent_keys = antecedent_keys * n_champions + antecedent_items[:, column]
+            # Every subset of a frequent itemset is frequent, so the lookup always hits
+            antecedent_counts = parent_counts[np.searchsorted(parent_keys, antecedent_keys)]
+            consequents = items[:, consequent_column]
+            # Ratios of supports rather than of counts, so threshold ties round as in mlxtend
+            support = counts / n_transactions
+            confidence = support / (antecedent_counts / n_transactions)
+            lift = confidence / (item_counts[consequents] / n_transactions)
+            keep = confidence >= min_threshold
+            rules.append(pd.DataFrame({
+                'antecedents': [tuple(champions[row]) for row in antecedent_items[keep]],
+                'consequents': [(champions[code],) for code in consequents[keep]],
+                'support': support[keep],
+                'confidence': confidence[keep],
+                'lift': lift[keep]
+            }))
+    if not rules:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(rules, ignore_index=True)
+
+def _explode_rules(rules):
+    """One row per (antecedent champion, consequent) with the best confidence of any rule linking them."""
+    ally_rules = rules[['antecedents', 'consequents', 'confidence', 'lift']].explode('antecedents')
+    ally_rules = ally_rules.rename(columns={'antecedents': 'antecedent_champion'})
+    ally_rules['consequent'] = ally_rules.pop('consequents').str[0]
+    ally_rules = ally_rules.sort_values('confidence', ascending=False, kind='stable')
+    ally_rules = ally_rules.drop_duplicates(['antecedent_champion', 'consequent'])
+    return ally_rules[['antecedent_champion', 'consequent', 'confidence', 'lift']]
+
+def _team_array(teams):
+    """Stack 5-champion teams into an (n, 5) object array of space-stripped names (None kept)."""
+    array = np.empty((len(teams), 5), dtype=object)
+    for i, team in enumerate(teams):
+        array[i] = [champ.replace(" ", "") if champ else None for champ in team]
+    return array
+
+class WinRateIndex:
+    """Dense in-memory view of the win_rates table keyed by (champion_id, opponent_id, lane_id).
+
+    The opponent axis carries one extra trailing slot holding the per-champion-lane baseline
+    (rows stored with a NULL opponent). Missing keys have a NaN win rate. Each win rate comes with
+    the bounds of its confidence interval. The arrays are int32 and float32 so they can be
+    published as a win_rate_matrix artifact and mapped as they are.
+    """
+    def __init__(self, win_rates):
+        self._set_keys(sorted(set(win_rates['champion']) | set(win_rates['opponent'].dropna())), sorted(set(win_rates['lane'])))
+        shape = (len(self.champions), len(self.champions) + 1, len(self.lanes))
+        self.wins = np.zeros(shape, dtype=np.int32)
+        self.total = np.zeros(shape, dtype=np.int32)
+        self.win_rate = np.full(shape, np.nan, dtype=np.float32)
+        self.win_rate_low = np.full(shape, np.nan, dtype=np.float32)
+        self.win_rate_high = np.full(shape, np.nan, dtype=np.float32)
+        if win_rates.empty:
+            return
+        champ = win_rates['champion'].map(self.champion_ids).to_numpy()
+        opp = win_rates['opponent'].map(self.champion_ids).fillna(self.baseline_id).to_numpy(dtype=np.int64)
+        lane = win_rates['lane'].map(self.lane_ids).to_numpy()
+        self.wins[champ, opp, lane] = win_rates['wins'].to_numpy()
+        self.total[champ, opp, lane] = win_rates['total_matches'].to_numpy()
+        self.win_rate[champ, opp, lane] = win_rates['win_rate'].to_numpy()
+        # Rows of a win_rates table written before intervals were stored get closed-form ones
+        low = win_rates['win_rate_low'].to_numpy(dtype=np.float64, na_value=np.nan) if 'win_rate_low' in win_rates else np.full(len(win_rates), np.nan)
+        high = win_rates['win_rate_high'].to_numpy(dtype=np.float64, na_value=np.nan) if 'win_rate_high' in win_rates else np.full(len(win_rates), np.nan)
+        missing = np.isnan(low) | np.isnan(high)
+        if missing.any():
+            low[missing], high[missing] = wilson_interval(
+                win_rates['wins'].to_numpy()[missing], win_rates['total_matches'].to_numpy()[missing], PRIOR_WEIGHT, PRIOR_WIN_RATE
+            )
+        self.win_rate_low[champ, opp, lane] = low
+        self.win_rate_high[champ, opp, lane] = high
+
+    @classmethod
+    def from_matrix(cls, header, arrays):
+        """Index over the read-only arrays of a published artifact (see win_rate_matrix.read_matrix)."""
+        index = cls.__new__(cls)
+        index._set_keys(header['champions'], header['lanes'])
+        index.wins, index.total, index.win_rate = arrays['wins'], arrays['total'], arrays['win_rate']
+        index.win_rate_low, index.win_rate_high = arrays['win_rate_low'], arrays['win_rate_high']
+        return index
+
+    def _set_keys(self, champions, lanes):
+        self.champions = list(champions)
+        self.lanes = list(lanes)
+        self.champion_ids = {champion: i for i, champion in enumerate(self.champions)}
+        self.lane_ids = {lane: i for i, lane in enumerate(self.lanes)}
+        self.baseline_id = len(self.champions)
+
+    def _slot(self, champion, opponent, lane):
+        """(champion_id, opponent_id, lane_id) holding a matchup's win rate, falling back to the
+        champion's lane baseline; None when neither is stored."""
+        champ = self.champion_ids.get(champion)
+        lane_id = self.lane_ids.get(lane)
+        if champ is None or lane_id is None:
+            return None
+        for opp in (self.champion_ids.get(opponent), self.baseline_id):
+            if opp is not None and not np.isnan(self.win_rate[champ, opp, lane_id]):
+                return champ, opp, lane_id
+        return None
+
+    def lookup(self, champion, opponent, lane, interval=False):
+        """Return (wins, total_matches, win_rate) for a matchup, falling back to the champion's
+        lane baseline and then to a neutral 50%. With interval=True the bounds of the win rate's
+        confidence interval follow: (wins, total_matches, win_rate, win_rate_low, win_rate_high)."""
+        slot = self._slot(champion, opponent, lane)
+        if slot is None:
+            return (0, 0, 50.0, *NEUTRAL_INTERVAL) if interval else (0, 0, 50.0)
+        counts = int(self.wins[slot]), int(self.total[slot]), float(self.win_rate[slot])
+        return (*counts, float(self.win_rate_low[slot]), float(self.win_rate_high[slot])) if interval else counts
+
+    def _encode(self, names, ids):
+        names = np.asarray(names, dtype=object)
+        return np.array([ids.get(name, -1) for name in names.ravel()], dtype=np.int64).reshape(names.shape)
+
+    def _gather(self, champ, opp, lane, found, interval):
+        """Win rates at resolved slots, neutral where found is False; with their interval bounds if asked."""
+        rates = np.where(found, self.win_rate[champ, opp, lane], 50.0)
+        if not interval:
+            return rates
+        return (
+            rates,
+            np.where(found, self.win_rate_low[champ, opp, lane], NEUTRAL_INTERVAL[0]),
+            np.where(found, self.win_rate_high[champ, opp, lane], NEUTRAL_INTERVAL[1])
+        )
+
+    def lookup_win_rates(self, champions, opponents, lanes, interval=False):
+        """Vectorized lookup over equally-shaped arrays of champion, opponent and lane names,
+        with the same fallback order as lookup(). Unknown names score a neutral 50%.
+
+        With interval=True, returns (win rates, interval lows, interval highs).
+        """
+        champ = self._encode(champions, self.champion_ids)
+        opp = self._encode(opponents, self.champion_ids)
+        lane = self._encode(lanes, self.lane_ids)
+        if not self.champions:
+            rates = np.full(champ.shape, 50.0)
+            return (rates, np.full(champ.shape, NEUTRAL_INTERVAL[0]), np.full(champ.shape, NEUTRAL_INTERVAL[1])) if interval else rates
+        known = (champ >= 0) & (lane >= 0)
+        champ, lane = np.where(known, champ, 0), np.where(known, lane, 0)
+        opp = np.where(opp >= 0, opp, self.baseline_id)
+        opp = np.where(np.isnan(self.win_rate[champ, opp, lane]), self.baseline_id, opp)
+        return self._gather(champ, opp, lane, known & ~np.isnan(self.win_rate[champ, opp, lane]), interval)
+
+    def lane_matrix(self, lane, opponent_ids, interval=False):
+        """Win rates of every champion (rows) against opponent_ids (columns) in lane, with lookup()'s fallbacks.
+
+        With interval=True, returns (win rates, interval lows, interval highs).
+        """
+        opponent_ids = np.asarray(opponent_ids, dtype=np.int64)
+        shape = (len(self.champions), len(opponent_ids))
+        lane_id = self.lane_ids.get(lane)
+        if lane_id is None:
+            rates = np.full(shape, 50.0)
+            return (rates, np.full(shape, NEUTRAL_INTERVAL[0]), np.full(shape, NEUTRAL_INTERVAL[1])) if interval else rates
+        champ = np.arange(len(self.champions))[:, None]
+        opp = np.broadcast_to(opponent_ids[None, :], shape)
+        opp = np.where(np.isnan(self.win_rate[champ, opp, lane_id]), self.baseline_id, opp)
+        return self._gather(champ, opp, lane_id, ~np.isnan(self.win_rate[champ, opp, lane_id]), interval)
 
 class MatchDataAnalyzer:
-    def __init__(self, db_path=DB_PATH):
+    def __init__(self, db_path=DB_PATH, refresh=True, read_only=False, interval_method=WIN_RATE_INTERVAL_METHOD):
+        """Open the database and load the cached win rates and ally rules.
+
+        With refresh=False the persisted caches are served as they are, even if matchups has
+        grown since they were built; call refresh_caches() (or build a second analyzer
+        elsewhere and adopt_caches() from it) to bring them up to date. With read_only=True
+        every connection is switched to query_only once the tables exist. interval_method picks how
+        the stored win rate confidence intervals are computed (see win_rate_intervals.INTERVAL_METHODS).
+        """
         self.db_path = Path(db_path)
+        self.interval_method = interval_method
         if not self.db_path.exists():
             raise FileNotFoundError(f"Database not found at {self.db_path}")
-        self.conn = sqlite3.connect(self.db_path)
+        self.read_only = False
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
         self._setup_tables()
         self._optimize_database()
-        self.df = pd.read_sql_query("SELECT * FROM matchups", self.conn)
-        self.match_data = self.df.groupby('match_id').agg({
-            'champion': list,
-            'lane': list,
-            'winner': list
-        }).reset_index()
-        self.all_champions = sorted(self.df['champion'].unique())
-
-        # Check if match count has changed
-        current_match_count = len(self.match_data)
-        previous_match_count = self._get_previous_match_count()
-        if previous_match_count is None or current_match_count != previous_match_count:
-            print(f"Match count changed (previous: {previous_match_count or 'none'}, current: {current_match_count}). Updating caches...")
-            self.update_win_rates()
-            self.update_association_rules()
-            self._save_match_count(current_match_count)
+        self._df = None
+        self.response_cache = ResponseCache()
+        self._window_indexes = OrderedDict()  # normalized window -> (cache generation, WinRateIndex)
+        self._window_lock = threading.Lock()
+        self._window_builds = {}  # normalized window -> lock held while that window's index is built
+        self.matrix_path = matrix_path(self.db_path)
+        self._load_win_rate_index()
+        self._load_rules()
+        if self._matrix_signature is not None and self._matrix_rowid == self._get_max_rowid():
+            # A fresh artifact indexes exactly the champions in matchups; skip scanning for them
+            self.all_champions = list(self.win_rate_index.champions)
         else:
-            print("Match count unchanged. Using existing caches.")
+            self.all_champions = [row[0] for row in self.conn.execute("SELECT DISTINCT champion FROM matchups ORDER BY champion")]
+        if refresh:
+            self.refresh_caches()
+        if read_only:
+            self.read_only = True
+            with self._connections_lock:
+                for conn in self._connections:
+                    conn.execute("PRAGMA query_only = ON")
+
+    @property
+    def conn(self):
+        """The calling thread's connection, opened on first use so the analyzer can be shared across threads."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Used by this thread only; check_same_thread=False just lets close() run from any thread
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            if self.read_only:
+                conn.execute("PRAGMA query_only = ON")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        """Close the connections of every thread that used the analyzer."""
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+    def refresh_caches(self):
+        """Bring win_rates and rules up to date with matchups; the rebuild steps reload the in-memory caches.
+
+        Holds an exclusive lock file next to the database, so when several API workers start
+        against a stale database only the first rebuilds; the others then load its result.
+        """
+        with open(self.db_path.with_suffix('.lock'), 'w') as lock:
+            _lock_exclusive(lock)
+            # Fold in only the matchups rows added since the last cache build
+            previous_rowid = self._get_metadata('matchups_rowid')
+            current_rowid = self._get_max_rowid()
+            if previous_rowid is None or current_rowid < previous_rowid:
+                print(f"No valid high-water mark (stored: {previous_rowid or 'none'}, current rowid: {current_rowid}). Rebuilding caches...")
+                self.rebuild_caches()
+            elif current_rowid > previous_rowid:
+                print(f"New matchups rows since rowid {previous_rowid}. Updating caches incrementally...")
+                self.update_caches_incremental(previous_rowid)
+            elif self._get_metadata('cache_generation') != self.cache_generation:
+                print("Caches were refreshed by another process. Reloading them...")
+                self._load_win_rate_index()
+                self._load_rules()
+            elif self._get_metadata('build_stats_rowid') != current_rowid:
+                print("build_stats is behind matchups (database built before it existed). Building it...")
+                self.update_build_stats(current_rowid)
+                self.conn.commit()
+            elif self.conn.execute("SELECT 1 FROM win_rates WHERE win_rate_low IS NULL LIMIT 1").fetchone() is not None:
+                print("win_rates has no confidence intervals (built before they were stored). Computing them...")
+                self._update_intervals("win_rate_low IS NULL")
+                self._bump_cache_generation()
+                self.conn.commit()
+                self._load_win_rate_index()
+                self._publish_win_rate_matrix()
+            else:
+                print("No new matches. Using existing caches.")
+
+    def cache_status(self):
+        """Report how far the cached tables lag behind matchups."""
+        cached_rowid = self._get_metadata('matchups_rowid')
+        current_rowid = self._get_max_rowid()
+        return {
+            'cached_rowid': cached_rowid,
+            'current_rowid': current_rowid,
+            'fresh': cached_rowid == current_rowid
+        }
+
+    def adopt_caches(self, other):
+        """Swap in the in-memory caches of another analyzer, e.g. one refreshed in the background."""
+        self.win_rate_index = other.win_rate_index
+        self._matrix_signature = other._matrix_signature
+        self._matrix_rowid = other._matrix_rowid
+        self.ally_suggestions = other.ally_suggestions
+        self.ally_lift = other.ally_lift
+        self.all_champions = other.all_champions
+        self.cache_generation = other.cache_generation
+
+    @property
+    def df(self):
+        """Cache-building columns of matchups, loaded on first use and dropped once the caches are built."""
+        if self._df is None:
+            self._df = self._read_matchups()
+        return self._df
+
+    def _read_matchups(self, max_rowid=None, min_rowid=None):
+        """Read only the columns the win rate and rules builds use, with categorical text columns,
+        the patch and the game's UTC day number (NaN for rows stored without them)."""
+        query = f"SELECT match_id, lane, champion, winner, game_version, game_creation / {DAY_MS} AS day FROM matchups WHERE 1"
+        params = ()
+        if min_rowid is not None:
+            query += " AND rowid > ?"
+            params += (min_rowid,)
+        if max_rowid is not None:
+            query += " AND rowid <= ?"
+            params += (max_rowid,)
+        # Fetched in chunks: the full result as row tuples would take several times the frame's memory
+        chunks = [
+            _with_patch(chunk.astype({'match_id': 'category', 'lane': 'category', 'champion': 'category'}))
+            for chunk in pd.read_sql_query(query, self.conn, params=params, dtype={'day': 'float64'}, chunksize=READ_CHUNK_ROWS)
+        ]
+        return _concat_chunks(chunks)
 
     def _setup_tables(self):
+        add_matchup_columns(self.conn)  # databases crawled before game_version/game_creation were stored
         cursor = self.conn.cursor()
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS win_rates (
@@ -77,9 +589,16 @@ class MatchDataAnalyzer:
                 wins INTEGER,
                 total_matches INTEGER,
                 win_rate REAL,
+                win_rate_low REAL,
+                win_rate_high REAL,
                 PRIMARY KEY (champion, opponent, lane)
             )
         """)
+        # Tables built before intervals were stored get them on the next refresh
+        existing = {row[1] for row in cursor.execute("PRAGMA table_info(win_rates)")}
+        for column in ('win_rate_low', 'win_rate_high'):
+            if column not in existing:
+                cursor.execute(f"ALTER TABLE win_rates ADD COLUMN {column} REAL")
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS rules (
                 antecedents TEXT,
@@ -89,6 +608,39 @@ class MatchDataAnalyzer:
                 lift REAL
             )
         """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS ally_rules (
+                antecedent_champion TEXT,
+                consequent TEXT,
+                confidence REAL,
+                lift REAL,
+                PRIMARY KEY (antecedent_champion, consequent)
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS win_rate_buckets (
+                patch TEXT NOT NULL,
+                day INTEGER NOT NULL,
+                champion TEXT NOT NULL,
+                opponent TEXT,
+                lane TEXT NOT NULL,
+                wins INTEGER,
+                total_matches INTEGER,
+                PRIMARY KEY (patch, day, champion, opponent, lane)
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS build_stats (
+                champion TEXT NOT NULL,
+                lane TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                build TEXT NOT NULL,
+                wins INTEGER,
+                total_matches INTEGER,
+                win_rate REAL,
+                PRIMARY KEY (champion, lane, kind, build)
+            )
+        """)
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS metadata (
                 key TEXT PRIMARY KEY,
@@ -103,140 +655,642 @@ class MatchDataAnalyzer:
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_match_id ON matchups (match_id)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_champion ON matchups (champion)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_lane ON matchups (lane)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_win_rates_key ON win_rates (champion, opponent, lane)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_ally_rules_confidence ON ally_rules (antecedent_champion, confidence DESC)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_win_rate_buckets_day ON win_rate_buckets (day)")
         self.conn.commit()
 
-    def _get_previous_match_count(self):
-        """Retrieve the stored match count from the metadata table."""
+    def _get_metadata(self, key):
+        """Retrieve a stored integer value from the metadata table."""
         cursor = self.conn.cursor()
-        cursor.execute("SELECT value FROM metadata WHERE key = 'match_count'")
+        cursor.execute("SELECT value FROM metadata WHERE key = ?", (key,))
         result = cursor.fetchone()
         return result[0] if result else None
 
+    def _set_metadata(self, key, value):
+        """Store an integer value in the metadata table (committed by the caller)."""
+        self.conn.execute("INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)", (key, value))
+
+    def _bump_cache_generation(self):
+        """Mark win_rates/rules as rewritten so response caches built on them are dropped (committed by the caller)."""
+        self._set_metadata('cache_generation', (self._get_metadata('cache_generation') or 0) + 1)
+
+    def _get_max_rowid(self):
+        """Return the current high-water mark of the matchups table (0 when empty)."""
+        return self.conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM matchups").fetchone()[0]
+
+    def _get_previous_match_count(self):
+        """Retrieve the stored match count from the metadata table."""
+        return self._get_metadata('match_count')
+
     def _save_match_count(self, match_count):
         """Save the current match count to the metadata table."""
-        cursor = self.conn.cursor()
-        cursor.execute("INSERT OR REPLACE INTO metadata (key, value) VALUES ('match_count', ?)", (match_count,))
+        self._set_metadata('match_count', match_count)
         self.conn.commit()
         print(f"Saved match count: {match_count}")
 
+    def _load_win_rate_index(self):
+        """Swap in the win rate index: mapped from the published artifact if it is current, else read from win_rates."""
+        generation = self._get_metadata('cache_generation') or 0
+        published = read_matrix(self.matrix_path)
+        if published is not None and published[0]['generation'] == generation:
+            header, arrays = published
+            self.win_rate_index = WinRateIndex.from_matrix(header, arrays)
+            self._matrix_signature = header['signature']
+            self._matrix_rowid = header['matchups_rowid']
+        else:
+            win_rates = pd.read_sql_query(
+                "SELECT champion, opponent, lane, wins, total_matches, win_rate, win_rate_low, win_rate_high FROM win_rates", self.conn
+            )
+            self.win_rate_index = WinRateIndex(win_rates)
+            self._matrix_signature = None
+            self._matrix_rowid = None
+        self.cache_generation = generation
+
+    def _publish_win_rate_matrix(self):
+        """Write the current win rate index as the shared artifact and map it in place of the private copy."""
+        index = self.win_rate_index
+        arrays = {name: getattr(index, name) for name in ('wins', 'total', 'win_rate', 'win_rate_low', 'win_rate_high')}
+        if not write_matrix(self.matrix_path, index.champions, index.lanes, arrays, self.cache_generation, self._get_metadata('matchups_rowid')):
+            # The stale artifact's generation no longer matches, so every process reads win_rates instead
+            print(f"Could not replace {self.matrix_path} while it is mapped (Windows). Keeping the in-memory win rates.")
+            self._matrix_signature = None
+            self._matrix_rowid = None
+            return
+        self._load_win_rate_index()
+
+    def reload_published_caches(self):
+        """Load a newer artifact published by another process, with the matching rules; True if one was loaded.
+
+        Costs one stat() when nothing changed, so serving processes can poll it.
+        """
+        signature = matrix_signature(self.matrix_path)
+        if signature is None or signature == self._matrix_signature:
+            return False
+        published = read_matrix(self.matrix_path)
+        if published is None or published[0]['generation'] <= self.cache_generation:
+            return False
+        header, arrays = published
+        self.win_rate_index = WinRateIndex.from_matrix(header, arrays)
+        self._matrix_signature = header['signature']
+        self._matrix_rowid = header['matchups_rowid']
+        self._load_rules()
+        return True
+
+    def _window_counts(self, kind, value):
+        """Sum win_rate_buckets over a parsed window into a win_rates-shaped frame."""
+        params = ()
+        if kind == 'patches':
+            patches = sorted((row[0] for row in self.conn.execute("SELECT DISTINCT patch FROM win_rate_buckets")), key=_patch_key)[-value:]
+            where = f"patch IN ({', '.join('?' * len(patches))})" if patches else "0"
+            params = tuple(patches)
+        else:
+            max_day = self.conn.execute("SELECT max(day) FROM win_rate_buckets").fetchone()[0] or 0
+            horizon = value if kind == 'days' else value * DECAY_HORIZON_HALF_LIVES
+            where = "day > ?"
+            params = (max_day - horizon,)
+        buckets = pd.read_sql_query(
+            f"SELECT day, champion, opponent, lane, wins, total_matches FROM win_rate_buckets WHERE {where}",
+            self.conn, params=params
+        )
+        if kind == 'half_life':
+            weights = 0.5 ** ((max_day - buckets['day']) / value)
+            buckets['wins'] = buckets['wins'] * weights
+            buckets['total_matches'] = buckets['total_matches'] * weights
+        counts = _apply_prior(_sum_buckets(buckets), self.interval_method)
+        # Decayed counts are effective match counts; the win rate above keeps their fractions
+        for column in ('wins', 'total_matches'):
+            counts[column] = counts[column].round().astype(np.int64)
+        return counts
+
+    def _index_for(self, window):
+        """Return (normalized window, WinRateIndex): the all-time index for None, else one built from
+        win_rate_buckets and kept for the current cache generation (WINDOW_CACHE_SIZE most recent).
+
+        Concurrent requests for the same uncached window wait for a single build instead of each
+        summing the buckets.
+        """
+        window = _parse_window(window)
+        if window is None:
+            return None, self.win_rate_index
+        generation = self.cache_generation
+        with self._window_lock:
+            cached = self._window_indexes.get(window)
+            if cached is not None and cached[0] == generation:
+                self._window_indexes.move_to_end(window)
+                return window, cached[1]
+            build_lock = self._window_builds.setdefault(window, threading.Lock())
+        with build_lock:
+            with self._window_lock:
+                cached = self._window_indexes.get(window)
+                if cached is not None and cached[0] == generation:
+                    return window, cached[1]  # built by the thread we waited for
+            with metrics.timer('window_index_seconds', kind=window[0]):
+                index = WinRateIndex(self._window_counts(*window))
+            with self._window_lock:
+                self._window_indexes[window] = (generation, index)
+                self._window_indexes.move_to_end(window)
+                while len(self._window_indexes) > WINDOW_CACHE_SIZE:
+                    self._window_indexes.popitem(last=False)
+                self._window_builds.pop(window, None)
+        return window, index
+
+    def _load_rules(self):
+        """Load the top ally suggestions and every ally's lift per champion into memory, keyed case-insensitively."""
+        self.cache_generation = self._get_metadata('cache_generation') or 0
+        if self.conn.execute("SELECT 1 FROM ally_rules LIMIT 1").fetchone() is None:
+            self._backfill_ally_rules()
+        self.ally_suggestions = {}
+        self.ally_lift = {}
+        rows = self.conn.execute(
+            "SELECT antecedent_champion, consequent, confidence, lift FROM ally_rules ORDER BY antecedent_champion, confidence DESC"
+        )
+        for champion, consequent, confidence, lift in rows:
+            suggestions = self.ally_suggestions.setdefault(champion.lower(), [])
+            if len(suggestions) < ALLY_SUGGESTION_LIMIT:
+                suggestions.append({consequent: confidence})
+            self.ally_lift.setdefault(champion.lower(), {})[consequent] = lift
+
+    def _backfill_ally_rules(self):
+        """Explode a rules table written before ally_rules existed."""
+        rules = pd.read_sql_query("SELECT antecedents, consequents, confidence, lift FROM rules", self.conn)
+        if rules.empty:
+            return
+        rules['antecedents'] = rules['antecedents'].str.split(',')
+        rules['consequents'] = rules['consequents'].str.split(',')
+        _explode_rules(rules).to_sql('ally_rules', self.conn, if_exists='append', index=False)
+        self.conn.commit()
+
+    def rebuild_caches(self, profile_path=REBUILD_PROFILE_PATH):
+        """Recompute win_rates and rules from the whole matchups table and reset the high-water mark.
+
+        Each phase is timed into cache_build_seconds; with profile_path set the rebuild also runs
+        under cProfile and the stats are dumped there.
+        """
+        with profiled(profile_path), metrics.timer('cache_build_seconds', phase='total'):
+            current_rowid = self._get_max_rowid()
+            # Streams matchups in chunks of its own, so it runs before the frame below is loaded.
+            # Committed on its own so the write lock is not held through the passes below.
+            with metrics.timer('cache_build_seconds', phase='build_stats'):
+                self.update_build_stats(current_rowid, rebuild=True)
+                self.conn.commit()
+            with metrics.timer('cache_build_seconds', phase='read_matchups'):
+                self._df = self._read_matchups(current_rowid)
+            try:
+                match_count = self.df['match_id'].nunique()
+                with metrics.timer('cache_build_seconds', phase='win_rates'):
+                    self.update_win_rates()
+                with metrics.timer('cache_build_seconds', phase='association_rules'):
+                    self.update_association_rules()
+                self._set_metadata('matchups_rowid', current_rowid)
+                self._set_metadata('rules_match_count', match_count)
+                self._save_match_count(match_count)
+            finally:
+                self._df = None  # serving needs only the caches
+            self._publish_win_rate_matrix()
+
+    def update_caches_incremental(self, since_rowid):
+        """Fold matchups rows with rowid > since_rowid into the stored caches.
+
+        Win/total counts are added to win_rates and only the touched keys are re-scored.
+        Rules depend on global supports, so they are rebuilt only once the matches added
+        since their last build exceed RULES_REFRESH_FRACTION of the total.
+        """
+        with metrics.timer('cache_build_seconds', phase='incremental'):
+            current_rowid = self._get_max_rowid()
+            new_rows = self._read_matchups(current_rowid, since_rowid)
+            match_count = (self._get_previous_match_count() or 0) + new_rows['match_id'].nunique()
+            self.update_build_stats(current_rowid)
+            self.update_win_rates_incremental(new_rows)
+            self._set_metadata('matchups_rowid', current_rowid)
+            self._save_match_count(match_count)
+            self._load_win_rate_index()
+
+            rules_match_count = self._get_metadata('rules_match_count') or 0
+            if match_count - rules_match_count > RULES_REFRESH_FRACTION * rules_match_count:
+                self._df = self._read_matchups(current_rowid)
+                try:
+                    with metrics.timer('cache_build_seconds', phase='association_rules'):
+                        self.update_association_rules()
+                    self._set_metadata('rules_match_count', match_count)
+                    self.conn.commit()
+                finally:
+                    self._df = None
+            self._publish_win_rate_matrix()
+
     def update_win_rates(self):
-        """Calculate and store lane-specific win rates."""
+        """Calculate and store lane-specific win rates, and their counts per patch and day.
+
+        Everything is counted before the first DELETE, so the write transaction (and the database's
+        write lock, which the crawlers wait on) lasts only as long as the inserts.
+        """
         win_rates_df = self.calculate_win_rates()
-        win_rates_df.to_sql('win_rates', self.conn, if_exists='replace', index=False)
+        counts = _aggregate_win_counts(self.df, by=['patch', 'day']) if not self.df.empty else None
+        # Keep the table definitions (and their key indexes) so incremental updates can find rows
+        self.conn.execute("DELETE FROM win_rates")
+        win_rates_df.to_sql('win_rates', self.conn, if_exists='append', index=False)
+        self.conn.execute("DELETE FROM win_rate_buckets")
+        if counts is None:
+            return
+        # About one row per participant on large crawls, so converted and inserted in chunks
+        for start in range(0, len(counts), BUCKET_WRITE_CHUNK):
+            _known_buckets(counts.iloc[start:start + BUCKET_WRITE_CHUNK]).to_sql('win_rate_buckets', self.conn, if_exists='append', index=False)
+        self._bump_cache_generation()
+        self.conn.commit()
+        self._load_win_rate_index()
         print("Updated win_rates table")
 
+    def update_win_rates_incremental(self, new_rows):
+        """Add the win/total counts of new matchups rows into win_rates and re-score touched keys.
+
+        Not committed here, so the caller can commit it together with the new high-water mark.
+        """
+        if new_rows.empty:
+            return
+        bucket_delta = _aggregate_win_counts(new_rows, by=['patch', 'day'])
+        delta = _sum_buckets(bucket_delta)
+        columns = ['champion', 'opponent', 'lane', 'wins', 'total_matches']
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS win_rates_delta (
+                champion TEXT,
+                opponent TEXT,
+                lane TEXT,
+                wins INTEGER,
+                total_matches INTEGER
+            )
+        """)
+        cursor.execute("DELETE FROM win_rates_delta")
+        cursor.executemany(
+            "INSERT INTO win_rates_delta VALUES (?, ?, ?, ?, ?)",
+            zip(*(delta[column].tolist() for column in columns))
+        )
+        cursor.execute("""
+            UPDATE win_rates
+            SET wins = win_rates.wins + d.wins, total_matches = win_rates.total_matches + d.total_matches
+            FROM win_rates_delta AS d
+            WHERE win_rates.champion = d.champion AND win_rates.opponent IS d.opponent AND win_rates.lane = d.lane
+        """)
+        cursor.execute("""
+            INSERT INTO win_rates (champion, opponent, lane, wins, total_matches)
+            SELECT d.champion, d.opponent, d.lane, d.wins, d.total_matches
+            FROM win_rates_delta AS d
+            WHERE NOT EXISTS (
+                SELECT 1 FROM win_rates AS w
+                WHERE w.champion = d.champion AND w.opponent IS d.opponent AND w.lane = d.lane
+            )
+        """)
+        cursor.execute("""
+            UPDATE win_rates
+            SET win_rate = (wins + ? * ?) * 100.0 / (total_matches + ?)
+            WHERE EXISTS (
+                SELECT 1 FROM win_rates_delta AS d
+                WHERE win_rates.champion = d.champion AND win_rates.opponent IS d.opponent AND win_rates.lane = d.lane
+            )
+        """, (PRIOR_WEIGHT, PRIOR_WIN_RATE, PRIOR_WEIGHT))
+        # Rows left without intervals by a table built before they were stored are scored along with them
+        self._update_intervals("""
+            win_rate_low IS NULL OR EXISTS (
+                SELECT 1 FROM win_rates_delta AS d
+                WHERE win_rates.champion = d.champion AND win_rates.opponent IS d.opponent AND win_rates.lane = d.lane
+            )
+        """)
+        self._add_bucket_counts(_known_buckets(bucket_delta))
+        self._bump_cache_generation()
+        print(f"Updated {len(delta)} win_rates keys from {new_rows['match_id'].nunique()} new matches")
+
+    def _update_intervals(self, condition):
+        """Recompute the confidence interval of the win_rates rows matching an SQL condition (not committed here)."""
+        rows = pd.read_sql_query(f"SELECT rowid, wins, total_matches FROM win_rates WHERE {condition}", self.conn)
+        low, high = win_rate_interval(rows['wins'].to_numpy(), rows['total_matches'].to_numpy(), PRIOR_WEIGHT, PRIOR_WIN_RATE, self.interval_method)
+        self.conn.executemany(
+            "UPDATE win_rates SET win_rate_low = ?, win_rate_high = ? WHERE rowid = ?",
+            zip(low.tolist(), high.tolist(), rows['rowid'].tolist())
+        )
+
+    def _add_bucket_counts(self, delta):
+        """Add per-(patch, day) counts into win_rate_buckets (not committed here)."""
+        columns = ['patch', 'day', 'champion', 'opponent', 'lane', 'wins', 'total_matches']
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS win_rate_buckets_delta (
+                patch TEXT,
+                day INTEGER,
+                champion TEXT,
+                opponent TEXT,
+                lane TEXT,
+                wins INTEGER,
+                total_matches INTEGER
+            )
+        """)
+        cursor.execute("DELETE FROM win_rate_buckets_delta")
+        cursor.executemany(
+            "INSERT INTO win_rate_buckets_delta VALUES (?, ?, ?, ?, ?, ?, ?)",
+            zip(*(delta[column].tolist() for column in columns))
+        )
+        cursor.execute("""
+            UPDATE win_rate_buckets
+            SET wins = win_rate_buckets.wins + d.wins, total_matches = win_rate_buckets.total_matches + d.total_matches
+            FROM win_rate_buckets_delta AS d
+            WHERE win_rate_buckets.patch = d.patch AND win_rate_buckets.day = d.day AND win_rate_buckets.champion = d.champion
+              AND win_rate_buckets.opponent IS d.opponent AND win_rate_buckets.lane = d.lane
+        """)
+        cursor.execute("""
+            INSERT INTO win_rate_buckets (patch, day, champion, opponent, lane, wins, total_matches)
+            SELECT d.patch, d.day, d.champion, d.opponent, d.lane, d.wins, d.total_matches
+            FROM win_rate_buckets_delta AS d
+            WHERE NOT EXISTS (
+                SELECT 1 FROM win_rate_buckets AS b
+                WHERE b.patch = d.patch AND b.day = d.day AND b.champion = d.champion AND b.opponent IS d.opponent AND b.lane = d.lane
+            )
+        """)
+
+    def _read_build_chunks(self, max_rowid, min_rowid=None):
+        """Yield the BUILD_COLUMNS of matchups rows in (min_rowid, max_rowid], BUILD_CHUNK_ROWS at a time."""
+        # Rows crawled before builds were stored have NULLs and are skipped
+        query = f"SELECT {', '.join(BUILD_COLUMNS)} FROM matchups WHERE {' AND '.join(f'{column} IS NOT NULL' for column in BUILD_COLUMNS)} AND rowid <= ?"
+        params = (max_rowid,)
+        if min_rowid is not None:
+            query += " AND rowid > ?"
+            params += (min_rowid,)
+        yield from pd.read_sql_query(query, self.conn, params=params, chunksize=BUILD_CHUNK_ROWS)
+
+    def update_build_stats(self, max_rowid, rebuild=False):
+        """Bring build_stats up to max_rowid in one chunked pass over the matchups rows it has not counted
+        (all of them with rebuild=True).
+
+        build_stats keeps its own high-water mark, so databases built before it existed are
+        counted in full once. The builds are counted before anything is written, so the write
+        transaction only covers the inserts. Not committed here.
+        """
+        built_rowid = self._get_metadata('build_stats_rowid')
+        rebuild = rebuild or built_rowid is None or max_rowid < built_rowid
+        if not rebuild and max_rowid == built_rowid:
+            return
+        counts = count_builds(self._read_build_chunks(max_rowid, None if rebuild else built_rowid))
+        if rebuild:
+            self.conn.execute("DELETE FROM build_stats")
+        # New builds are inserted, counted ones add up; either way the smoothed win rate is recomputed
+        self.conn.executemany("""
+            INSERT INTO build_stats (champion, lane, kind, build, wins, total_matches, win_rate)
+            VALUES (?1, ?2, ?3, ?4, ?5, ?6, (?5 + ?7 * ?8) * 100.0 / (?6 + ?7))
+            ON CONFLICT (champion, lane, kind, build) DO UPDATE SET
+                wins = wins + excluded.wins,
+                total_matches = total_matches + excluded.total_matches,
+                win_rate = (wins + excluded.wins + ?7 * ?8) * 100.0 / (total_matches + excluded.total_matches + ?7)
+        """, (
+            (*row, PRIOR_WEIGHT, PRIOR_WIN_RATE)
+            for row in zip(*(counts[column].tolist() for column in ['champion', 'lane', 'kind', 'build', 'wins', 'total_matches']))
+        ))
+        self._set_metadata('build_stats_rowid', max_rowid)
+        print(f"Updated {len(counts)} build_stats keys")
+
     def calculate_win_rates(self):
-        """Calculate lane-specific win rates using parallel processing."""
-        with Pool(cpu_count()) as pool:
-            results = pool.map(_process_match, [row for _, row in self.match_data.iterrows()])
-
-        wins = defaultdict(int)
-        total = defaultdict(int)
-        for win_dict, total_dict in results:
-            for key in win_dict:
-                wins[key] += win_dict[key]
-            for key in total_dict:
-                total[key] += total_dict[key]
-
-        prior_win_rate = 0.5  # Neutral prior (50%)
-        prior_weight = 10     # Equivalent to 10 matches
-        results = []
-        for (champion, opponent, lane), win_count in wins.items():
-            total_count = total[(champion, opponent, lane)]
-            if total_count > 0:
-                win_rate = ((win_count + prior_weight * prior_win_rate) / (total_count + prior_weight)) * 100
-                results.append({
-                    'champion': champion,
-                    'opponent': opponent,
-                    'lane': lane,
-                    'wins': win_count,
-                    'total_matches': total_count,
-                    'win_rate': win_rate
-                })
-        return pd.DataFrame(results)
+        """Calculate lane-specific win rates with a vectorized pass over the matchups table."""
+        if self.df.empty:
+            return pd.DataFrame(columns=['champion', 'opponent', 'lane', 'wins', 'total_matches', 'win_rate', 'win_rate_low', 'win_rate_high'])
+        return _apply_prior(_aggregate_win_counts(self.df), self.interval_method)
 
     def update_association_rules(self, min_support=0.005, min_threshold=0.1):
         """Compute and store association rules for winning team compositions."""
         rules_df = self.compute_association_rules(min_support, min_threshold)
+        ally_rules = _explode_rules(rules_df)
         rules_df['antecedents'] = rules_df['antecedents'].apply(lambda x: ','.join(x))
         rules_df['consequents'] = rules_df['consequents'].apply(lambda x: ','.join(x))
         rules_df[['antecedents', 'consequents', 'support', 'confidence', 'lift']].to_sql('rules', self.conn, if_exists='replace', index=False)
+        self.conn.execute("DELETE FROM ally_rules")
+        ally_rules.to_sql('ally_rules', self.conn, if_exists='append', index=False)
+        self._bump_cache_generation()
+        self.conn.commit()
+        self._load_rules()
         print("Updated rules table")
 
     def compute_association_rules(self, min_support=0.005, min_threshold=0.1):
-        """Compute association rules for champions in winning teams."""
-        winning_teams = self.df[self.df['winner'] == 1].groupby('match_id')['champion'].apply(list).reset_index(name='champions')
-        te = TransactionEncoder()
-        te_ary = te.fit(winning_teams['champions']).transform(winning_teams['champions'])
-        df_encoded = pd.DataFrame(te_ary, columns=te.columns_)
-        frequent_itemsets = apriori(df_encoded, min_support=min_support, use_colnames=True)
-        rules = association_rules(frequent_itemsets, metric="confidence", min_threshold=min_threshold)
-        single_consequent_rules = rules[rules['consequents'].apply(lambda x: len(x) == 1)]
-        return single_consequent_rules
-
-    def analyze_champion_matchup(self, my_champion: str, enemy_champion: str, lane: str):
-        """Analyze win rate and suggested allies for a champion matchup in a specific lane."""
+        """Compute single-consequent association rules for champions in winning teams."""
+        return _mine_association_rules(self.df, min_support, min_threshold)
+
+    def analyze_champion_matchup(self, my_champion: str, enemy_champion: str, lane: str, window=None):
+        """Analyze win rate and suggested allies for a champion matchup in a specific lane.
+
+        window limits the win rate to recent data; see _parse_window for the accepted specs.
+        win_rate_low and win_rate_high bound the win rate's confidence interval, which is wide when
+        few matches were analyzed.
+        """
         my_champion = my_champion.replace(" ", "")
         enemy_champion = enemy_champion.replace(" ", "")
-        query = "SELECT wins, total_matches, win_rate FROM win_rates WHERE champion = ? AND opponent = ? AND lane = ?"
-        result = pd.read_sql_query(query, self.conn, params=(my_champion, enemy_champion, lane))
-        if not result.empty:
-            wins, total, win_rate = result.iloc[0]
-        else:
-            query = "SELECT wins, total_matches, win_rate FROM win_rates WHERE champion = ? AND opponent IS NULL AND lane = ?"
-            result = pd.read_sql_query(query, self.conn, params=(my_champion, lane))
-            if not result.empty:
-                wins, total, win_rate = result.iloc[0]
-            else:
-                wins, total, win_rate = 0, 0, 50.0
-
-        query = "SELECT consequents, confidence FROM rules WHERE antecedents LIKE ? ORDER BY confidence DESC LIMIT 5"
-        rules_df = pd.read_sql_query(query, self.conn, params=(f'%{my_champion}%',))
-        suggestions = [{row['consequents']: row['confidence']} for _, row in rules_df.iterrows()]
+        generation = self.cache_generation
+        window, index = self._index_for(window)
+        key = ('matchup', my_champion, enemy_champion, lane, window)
+        analysis = self.response_cache.get(key, generation)
+        if analysis is not None:
+            return analysis
 
-        return {
+        wins, total, win_rate, win_rate_low, win_rate_high = index.lookup(my_champion, enemy_champion, lane, interval=True)
+        suggestions = list(self.ally_suggestions.get(my_champion.lower(), []))
+        analysis = {
             'my_champion': my_champion,
             'enemy_champion': enemy_champion,
             'lane': lane,
             'win_rate': win_rate,
+            'win_rate_low': win_rate_low,
+            'win_rate_high': win_rate_high,
             'matches_analyzed': total,
             'suggested_allies': suggestions
         }
+        self.response_cache.put(key, analysis, generation)
+        return analysis
+
+    def estimate_team_win_rate(self, my_team: list[str], enemy_team: list[str], lanes=['TOP', 'JUNGLE', 'MIDDLE', 'BOTTOM', 'UTILITY'],
+                               window=None, interval=False):
+        """Estimate team win rate as the average of champion-lane win rates vs. opponents.
 
-    def estimate_team_win_rate(self, my_team: list[str], enemy_team: list[str], lanes=['TOP', 'JUNGLE', 'MIDDLE', 'BOTTOM', 'UTILITY']):
-        """Estimate team win rate as the average of champion-lane win rates vs. opponents."""
+        Empty (None) slots score a neutral 50%; an empty enemy slot falls back to the lane baseline.
+        window limits the win rates to recent data, e.g. 'patches:2', 'days:14' or 'half_life:7'.
+        With interval=True, returns a dict with the win_rate and the win_rate_low/win_rate_high
+        bounds of its confidence interval, propagated from the five lanes' intervals.
+        """
         if len(my_team) != 5 or len(enemy_team) != 5 or len(lanes) != 5:
             raise ValueError("Each team and lanes list must have exactly 5 elements")
 
-        my_team = [champ.replace(" ", "") for champ in my_team]
-        enemy_team = [champ.replace(" ", "") for champ in enemy_team]
+        my_team = [champ.replace(" ", "") if champ else None for champ in my_team]
+        enemy_team = [champ.replace(" ", "") if champ else None for champ in enemy_team]
+        generation = self.cache_generation
+        window, index = self._index_for(window)
+        key = ('draft', tuple(my_team), tuple(enemy_team), tuple(lanes), window)
+        estimate = self.response_cache.get(key, generation)
+        if estimate is None:
+            my_team_win_rates = [
+                index.lookup(champ, opp_champ, lane, interval=True)[2:]
+                for champ, lane, opp_champ in zip(my_team, lanes, enemy_team)
+            ]
+            # _team_interval for one draft, in plain floats: NumPy's per-call overhead would dominate five lookups
+            win_rate = sum(rate for rate, _, _ in my_team_win_rates) / 5
+            team_sd = math.sqrt(sum(((high - low) / (2 * Z)) ** 2 for _, low, high in my_team_win_rates)) / 5
+            estimate = {'win_rate': win_rate, 'win_rate_low': max(win_rate - Z * team_sd, 0.0), 'win_rate_high': min(win_rate + Z * team_sd, 100.0)}
+            self.response_cache.put(key, estimate, generation)
+        return dict(estimate) if interval else estimate['win_rate']
 
-        my_team_win_rates = []
-        for champ, lane, opp_champ in zip(my_team, lanes, enemy_team):
-            query = "SELECT win_rate FROM win_rates WHERE champion = ? AND opponent = ? AND lane = ?"
-            result = pd.read_sql_query(query, self.conn, params=(champ, opp_champ, lane))
-            if not result.empty:
-                win_rate = result.iloc[0]['win_rate']
-            else:
-                query = "SELECT win_rate FROM win_rates WHERE champion = ? AND opponent IS NULL AND lane = ?"
-                result = pd.read_sql_query(query, self.conn, params=(champ, lane))
-                win_rate = result.iloc[0]['win_rate'] if not result.empty else 50.0
-            my_team_win_rates.append(win_rate)
-
-        enemy_team_win_rates = []
-        for champ, lane, opp_champ in zip(enemy_team, lanes, my_team):
-            query = "SELECT win_rate FROM win_rates WHERE champion = ? AND opponent = ? AND lane = ?"
-            result = pd.read_sql_query(query, self.conn, params=(champ, opp_champ, lane))
-            if not result.empty:
-                win_rate = result.iloc[0]['win_rate']
-            else:
-                query = "SELECT win_rate FROM win_rates WHERE champion = ? AND opponent IS NULL AND lane = ?"
-                result = pd.read_sql_query(query, self.conn, params=(champ, lane))
-                win_rate = result.iloc[0]['win_rate'] if not result.empty else 50.0
-            enemy_team_win_rates.append(win_rate)
+    def estimate_team_win_rates(self, my_teams: list[list[str]], enemy_teams: list[list[str]], lanes=['TOP', 'JUNGLE', 'MIDDLE', 'BOTTOM', 'UTILITY'],
+                                window=None, interval=False):
+        """Estimate win rates for many drafts in one vectorized lookup pass.
+
+        Empty (None) slots score a neutral 50%, like champions missing from win_rates. With
+        interval=True, returns (win rates, interval lows, interval highs) as estimate_team_win_rate does.
+        """
+        if len(my_teams) != len(enemy_teams):
+            raise ValueError("my_teams and enemy_teams must have the same number of drafts")
+        if len(lanes) != 5 or any(len(team) != 5 for team in my_teams) or any(len(team) != 5 for team in enemy_teams):
+            raise ValueError("Each team and lanes list must have exactly 5 elements")
+
+        _, index = self._index_for(window)
+        my = _team_array(my_teams)
+        enemy = _team_array(enemy_teams)
+        lane_names = np.broadcast_to(np.asarray(lanes, dtype=object), my.shape)
+        if not interval:
+            return index.lookup_win_rates(my, enemy, lane_names).mean(axis=1)
+        return _team_interval(*index.lookup_win_rates(my, enemy, lane_names, interval=True))
+
+    def recommend_picks(self, my_team: list[str], enemy_team: list[str], open_lane: str, k=5, two_ply=False,
+                        lanes=['TOP', 'JUNGLE', 'MIDDLE', 'BOTTOM', 'UTILITY'], window=None, lower_bound=False):
+        """Rank every champion not yet picked for my_team's open_lane slot and return the top k.
+
+        A candidate scores the team win rate estimate_team_win_rate would give with it in the slot,
+        plus SYNERGY_WEIGHT times its mean lift above 1 with the allies already picked. All
+        candidates are scored in one pass over the lane's champion x opponent win rate matrix.
+
+        With two_ply=True and the enemy's open_lane slot still empty, the max(TWO_PLY_BEAM, k)
+        best candidates (the beam widens to k so every returned pick is re-scored) are re-scored
+        against the enemy's best reply among the TWO_PLY_RESPONSES most-played champions in the
+        lane, and ranked by that worst case. Only matchups with at least TWO_PLY_MIN_MATCHES games
+        count as replies, so a one-game loss is not taken for a counter; a candidate without one
+        keeps its one-ply rate. window limits the win rates (and the most-played replies) to
+        recent data.
+
+        Each pick carries the team win rate's confidence interval. With lower_bound=True candidates
+        are ranked by the interval's lower bound instead of the win rate, so a champion rarely seen
+        in the matchup does not win on a few lucky games.
+        """
+        if len(my_team) != 5 or len(enemy_team) != 5 or len(lanes) != 5:
+            raise ValueError("Each team and lanes list must have exactly 5 elements")
+        if open_lane not in lanes:
+            raise ValueError(f"Unknown lane {open_lane!r}, expected one of {lanes}")
+
+        slot = lanes.index(open_lane)
+        my_team = [champ.replace(" ", "") if champ else None for champ in my_team]
+        enemy_team = [champ.replace(" ", "") if champ else None for champ in enemy_team]
+        my_team[slot] = None
+        generation = self.cache_generation
+        window, index = self._index_for(window)
+        key = ('picks', tuple(my_team), tuple(enemy_team), open_lane, k, two_ply, tuple(lanes), window, lower_bound)
+        picks = self.response_cache.get(key, generation)
+        if picks is not None:
+            return picks
+
+        picked = {champ for champ in my_team + enemy_team if champ}
+        available = np.array([champion not in picked for champion in index.champions], dtype=bool)
+        if not available.any():
+            return []
+
+        # The other four slots contribute the same amount whichever champion fills this one
+        rates, lows, highs = (values[0] for values in index.lookup_win_rates(
+            _team_array([my_team]), _team_array([enemy_team]), np.asarray([lanes], dtype=object), interval=True
+        ))
+        others = rates.sum() - rates[slot]
+        others_variance = (interval_sd(lows, highs) ** 2).sum() - interval_sd(lows[slot], highs[slot]) ** 2
+        opponent = index.champion_ids.get(enemy_team[slot], index.baseline_id)
+        lane_rates, lane_lows, lane_highs = (values[:, 0] for values in index.lane_matrix(open_lane, [opponent], interval=True))
+        lane_sds = interval_sd(lane_lows, lane_highs)
+
+        synergy = np.zeros(len(index.champions))
+        allies = [champ.lower() for champ in my_team if champ]
+        for ally in allies:
+            for consequent, lift in self.ally_lift.get(ally, {}).items():
+                champion_id = index.champion_ids.get(consequent)
+                if champion_id is not None:
+                    synergy[champion_id] += lift - 1
+        if allies:
+            synergy /= len(allies)
+
+        def team_scores(lane_rates, lane_sds):
+            team_rates = (others + lane_rates) / 5
+            team_sds = np.sqrt(others_variance + lane_sds ** 2) / 5
+            ranked = team_rates - Z * team_sds if lower_bound else team_rates
+            return team_rates, team_sds, ranked + SYNERGY_WEIGHT * synergy
+
+        team_rates, team_sds, scores = team_scores(lane_rates, lane_sds)
+        scores = np.where(available, scores, -np.inf)
+        counters = None
+        if two_ply and enemy_team[slot] is None:
+            lane_id = index.lane_ids.get(open_lane)
+            candidates = np.argsort(-scores, kind='stable')[:min(max(TWO_PLY_BEAM, k), int(available.sum()))]
+            played = index.total[:, index.baseline_id, lane_id] if lane_id is not None else np.zeros(len(index.champions))
+            responses = [i for i in np.argsort(-played, kind='stable') if available[i] and played[i] > 0][:TWO_PLY_RESPONSES]
+            if responses:
+                # Candidate x reply matrix; a champion cannot be picked by both teams, and thinly
+                # sampled matchups (or ones falling back to the baseline) are not replies
+                responses = np.asarray(responses)
+                matrix, matrix_lows, matrix_highs = (values[candidates] for values in index.lane_matrix(open_lane, responses, interval=True))
+                sampled = index.total[candidates[:, None], responses[None, :], lane_id] >= TWO_PLY_MIN_MATCHES
+                matrix[(candidates[:, None] == responses[None, :]) | ~sampled] = np.inf
+                worst = matrix.argmin(axis=1)
+                worst_rates = matrix[np.arange(len(candidates)), worst]
+                worst_sds = interval_sd(matrix_lows, matrix_highs)[np.arange(len(candidates)), worst]
+                replied = np.isfinite(worst_rates)
+                lane_rates, lane_sds = lane_rates.copy(), lane_sds.copy()
+                lane_rates[candidates] = np.where(replied, worst_rates, lane_rates[candidates])
+                lane_sds[candidates] = np.where(replied, worst_sds, lane_sds[candidates])
+                counters = {
+                    candidate: index.champions[response] if has_reply else None
+                    for candidate, response, has_reply in zip(candidates.tolist(), responses[worst].tolist(), replied.tolist())
+                }
+                team_rates, team_sds, replied_scores = team_scores(lane_rates, lane_sds)
+                scores = np.full(len(index.champions), -np.inf)
+                scores[candidates] = replied_scores[candidates]
+
+        top = np.argsort(-scores, kind='stable')[:k]
+        picks = []
+        for champion_id in top.tolist():
+            if not np.isfinite(scores[champion_id]):
+                break
+            pick = {
+                'champion': index.champions[champion_id],
+                'win_rate': float(team_rates[champion_id]),
+                'win_rate_low': float(max(team_rates[champion_id] - Z * team_sds[champion_id], 0)),
+                'win_rate_high': float(min(team_rates[champion_id] + Z * team_sds[champion_id], 100)),
+                'lane_win_rate': float(lane_rates[champion_id]),
+                'synergy': float(synergy[champion_id]),
+                'score': float(scores[champion_id])
+            }
+            if counters is not None:
+                pick['counter_pick'] = counters[champion_id]
+            picks.append(pick)
+        self.response_cache.put(key, picks, generation)
+        return picks
+
+    def top_builds(self, champion: str, lane: str, k=5, min_matches=BUILD_MIN_MATCHES):
+        """Best items, keystones, rune pages and summoner spell pairs for a champion in a lane.
+
+        Builds played at least min_matches times are ranked by smoothed win rate; at most k per kind.
+        """
+        champion = champion.replace(" ", "")
+        generation = self.cache_generation
+        key = ('builds', champion, lane, k, min_matches)
+        builds = self.response_cache.get(key, generation)
+        if builds is not None:
+            return builds
 
-        my_avg_win_rate = sum(my_team_win_rates) / len(my_team_win_rates) if my_team_win_rates else 50.0
-        return my_avg_win_rate
+        builds = {kind: [] for kind in BUILD_KINDS}
+        rows = self.conn.execute("""
+            SELECT kind, build, win_rate, total_matches FROM build_stats
+            WHERE champion = ? AND lane = ? AND total_matches >= ?
+            ORDER BY kind, win_rate DESC, total_matches DESC
+        """, (champion, lane, min_matches))
+        for kind, build, win_rate, total in rows:
+            ranked = builds.setdefault(kind, [])
+            if len(ranked) < k:
+                ranked.append({'build': build, 'win_rate': win_rate, 'matches_analyzed': total})
+        self.response_cache.put(key, builds, generation)
+        return builds
 
     def save_to_csv(self, df, filename):
         """Save DataFrame to CSV in the database directory."""
@@ -245,7 +1299,8 @@ class MatchDataAnalyzer:
         print(f"Saved to {output_path}")
 
     def __del__(self):
-        self.conn.close()
+        if hasattr(self, '_connections'):
+            self.close()
 
 if __name__ == "__main__":
     analyzer = MatchDataAnalyzer()
@@ -0,0 +1,163 @@
+import cProfile
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds, from sub-millisecond lookups to multi-minute cache builds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+HELP = {
+    'riot_api_request_seconds': "Riot API request latency by endpoint",
+    'riot_api_responses_total': "Riot API responses by endpoint and status code (429 = rate limited)",
+    'riot_api_transport_errors_total': "Riot API requests that failed without a response",
+    'db_write_batch_seconds': "Time to commit one MatchWriter batch",
+    'db_matches_written_total': "Matches committed to the matchups table",
+    'crawler_matches_processed_total': "Matches stored by the crawlers",
+    'crawler_matches_skipped_total': "Fetched matches rejected by process_match_details",
+    'cache_build_seconds': "Analyzer cache build time by phase",
+    'window_index_seconds': "Time to sum win_rate_buckets into a windowed win rate index",
+    'crawler_frontier_pending': "PUUIDs waiting in the crawl frontier",
+    'crawler_matches_stored': "Matches stored so far in this crawl, including earlier runs",
+    'http_request_seconds': "API request latency by route, method and status code",
+    'analyzer_cache_fresh': "1 when the served caches are up to date with matchups",
+    'response_cache_hits_total': "Prediction and matchup responses served from the response cache",
+    'response_cache_misses_total': "Response cache lookups that had to compute the response",
+    'response_cache_evictions_total': "Response cache entries dropped to stay within RESPONSE_CACHE_SIZE",
+}
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _key(name, labels):
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+def _format_value(value):
+    return repr(float(value)) if value != float('inf') else '+Inf'
+
+class Metrics:
+    """In-process counters, gauges and latency histograms, exported in the Prometheus text format.
+
+    Metrics are identified by name plus keyword labels; label values should come from a small
+    set (endpoints, phases, route templates) to keep the number of series bounded.
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._counters = {}  # (name, labels) -> value
+        self._gauges = {}
+        self._histograms = {}  # (name, labels) -> [per-bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def observe(self, name, seconds, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram[index] += 1
+                    break
+            histogram[-2] += seconds
+            histogram[-1] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observe the duration of the with-block, including when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            counters, gauges = dict(self._counters), dict(self._gauges)
+            histograms = {key: list(value) for key, value in self._histograms.items()}
+        lines = []
+        described = set()
+
+        def describe(name, kind):
+            if name not in described:
+                described.add(name)
+                if name in HELP:
+                    lines.append(f"# HELP {name} {HELP[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in sorted(counters.items()):
+            describe(name, 'counter')
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for (name, labels), value in sorted(gauges.items()):
+            describe(name, 'gauge')
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for (name, labels), histogram in sorted(histograms.items()):
+            describe(name, 'histogram')
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), histogram[:-2]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', _format_value(bound)),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram[-2])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram[-1]}")
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        """JSON-serializable summary: counter and gauge values, histogram count/sum/mean per series."""
+        with self._lock:
+            counters, gauges = dict(self._counters), dict(self._gauges)
+            histograms = {key: list(value) for key, value in self._histograms.items()}
+
+        def series(name, labels):
+            return name + _format_labels(labels)
+
+        return {
+            'counters': {series(*key): value for key, value in sorted(counters.items())},
+            'gauges': {series(*key): value for key, value in sorted(gauges.items())},
+            'histograms': {
+                series(*key): {'count': histogram[-1], 'sum_seconds': histogram[-2], 'mean_seconds': histogram[-2] / histogram[-1]}
+                for key, histogram in sorted(histograms.items()) if histogram[-1]
+            }
+        }
+
+    def write_json(self, path):
+        """Write snapshot() to path atomically, so a reader never sees a partial file."""
+        temporary = f"{path}.tmp"
+        with open(temporary, 'w') as file:
+            json.dump({'written_at': time.time(), **self.snapshot()}, file, indent=2)
+        os.replace(temporary, path)
+
+@contextmanager
+def profiled(path):
+    """Profile the with-block with cProfile and dump the stats to path; a no-op when path is falsy.
+
+    The dump loads with pstats or snakeviz. Sampling profilers such as py-spy attach to the
+    running process instead and need no hook.
+    """
+    if not path:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        print(f"Wrote profile to {path}")
+
+metrics = Metrics()
@@ -0,0 +1,46 @@
+import argparse
+import sqlite3
+from itertools import groupby
+from pathlib import Path
+from database import setup_database_v2, NormalizedMatchStore
+from config import DB_PATH, DB_V2_PATH
+
+def migrate_matchups(src_path=DB_PATH, dst_path=DB_V2_PATH, commit_every=1000):
+    """Copy the v1 matchups table into the normalized v2 schema, one match at a time."""
+    src_path, dst_path = Path(src_path), Path(dst_path)
+    if not src_path.exists():
+        print(f"Error: {src_path} not found")
+        return
+
+    setup_database_v2(dst_path)
+    src = sqlite3.connect(src_path)
+    src.row_factory = sqlite3.Row
+    store = NormalizedMatchStore(dst_path)
+    migrated = skipped = 0
+    try:
+        rows = src.execute("SELECT * FROM matchups ORDER BY match_id")
+        for _, match_rows in groupby(rows, key=lambda row: row['match_id']):
+            if store.insert_match([dict(row) for row in match_rows]):
+                migrated += 1
+            else:
+                skipped += 1
+            if (migrated + skipped) % commit_every == 0:
+                store.commit()
+                print(f"Migrated {migrated} matches ({skipped} already present)")
+        store.commit()
+        store.conn.execute("VACUUM")
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+    finally:
+        store.close()
+        src.close()
+
+    print(f"Successfully migrated {migrated} matches ({skipped} already present) to {dst_path}")
+    print(f"Size: {src_path.stat().st_size / 1e6:.1f} MB (v1) -> {dst_path.stat().st_size / 1e6:.1f} MB (v2)")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Migrate the matchups table to the normalized v2 schema")
+    parser.add_argument('--src', type=Path, default=DB_PATH)
+    parser.add_argument('--dst', type=Path, default=DB_V2_PATH)
+    args = parser.parse_args()
+    migrate_matchups(args.src, args.dst)
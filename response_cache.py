@@ -0,0 +1,69 @@
+import threading
+import time
+from collections import OrderedDict
+from config import RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_SECONDS
+from metrics import metrics
+
+class ResponseCache:
+    """Thread-safe LRU cache with a TTL, tied to the analyzer's cache generation.
+
+    Every call passes the generation of the tables the caller is serving from; a newer one
+    drops every entry computed under an older one.
+    """
+    def __init__(self, maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.generation = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self._lock = threading.Lock()
+
+    def _check_generation(self, generation):
+        """Drop the entries if the caller serves newer tables; False if the caller's are older."""
+        if self.generation is None or generation > self.generation:
+            self._entries.clear()
+            self.generation = generation
+        return generation == self.generation
+
+    def get(self, key, generation):
+        """Return the cached value for key, or None on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key) if self._check_generation(generation) else None
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                metrics.inc('response_cache_misses_total')
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            metrics.inc('response_cache_hits_total')
+            return entry[1]
+
+    def put(self, key, value, generation):
+        with self._lock:
+            if not self._check_generation(generation):
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+                metrics.inc('response_cache_evictions_total')
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl_seconds': self.ttl,
+                'generation': self.generation,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
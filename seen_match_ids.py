@@ -0,0 +1,124 @@
+import numpy as np
+
+LOAD_CHUNK_SIZE = 100000
+MERGE_THRESHOLD = 65536  # recent additions held in a Python set before folding them into the arrays
+INT64_MAX = np.iinfo(np.int64).max
+_POWERS_OF_TEN = 10 ** np.arange(1, 19, dtype=np.int64)
+
+def _split(match_id):
+    """Split 'NA1_5123456789' into ('NA1', 5123456789); IDs in any other form give (None, match_id)."""
+    platform, _, number = match_id.partition('_')
+    if platform and number.isascii() and number.isdigit():
+        key = int(number)
+        if key < INT64_MAX and str(key) == number:
+            return platform, key
+    return None, match_id
+
+class SeenMatchIds:
+    """Exact set of Riot match IDs stored as sorted int64 game numbers per platform.
+
+    A Python set of match ID strings costs ~100 bytes per ID; here each ID costs 8 bytes plus
+    a bounded set of recent additions, and membership is a binary search. Supports the subset
+    of the set API the crawlers use: `in`, add, discard and len.
+    """
+    def __init__(self):
+        self._sorted = {}  # platform -> sorted unique np.int64 array
+        self._recent = {}  # platform -> set of game numbers added since the last merge
+        self._recent_count = 0
+        self._other = set()  # IDs that are not PLATFORM_number
+
+    @classmethod
+    def from_connection(cls, conn):
+        """Load the distinct match IDs of the matchups table, parsing game numbers to integers in SQL."""
+        seen = cls()
+        # Skip-scan the primary key index: one seek per platform rather than a full scan
+        platforms = []
+        match_id = conn.execute("SELECT min(match_id) FROM matchups").fetchone()[0]
+        while match_id is not None:
+            platform, sep, _ = match_id.partition('_')
+            if platform and sep:
+                platforms.append(platform)
+                query, bound = "SELECT min(match_id) FROM matchups WHERE match_id >= ?", platform + '`'
+            else:
+                seen._other.add(match_id)
+                query, bound = "SELECT min(match_id) FROM matchups WHERE match_id > ?", match_id
+            match_id = conn.execute(query, (bound,)).fetchone()[0]
+        for platform in platforms:
+            # Range scan of this platform's IDs; '`' sorts right after '_'
+            cursor = conn.execute(
+                "SELECT CAST(substr(match_id, ?) AS INTEGER), length(match_id) - ? "
+                "FROM (SELECT DISTINCT match_id FROM matchups WHERE match_id >= ? AND match_id < ?)",
+                (len(platform) + 2, len(platform) + 1, platform + '_', platform + '`')
+            )
+            chunks = []
+            irregular = False
+            while rows := cursor.fetchmany(LOAD_CHUNK_SIZE):
+                numbers, lengths = np.array(rows, dtype=np.int64).T
+                # CAST stops at the first non-digit, so a positive number with as many digits as the
+                # suffix has characters is canonical; anything else (including 0) is re-checked below
+                digits = np.searchsorted(_POWERS_OF_TEN, numbers, side='right') + 1
+                regular = (numbers > 0) & (numbers < INT64_MAX) & (digits == lengths)
+                irregular |= not regular.all()
+                chunks.append(numbers[regular])
+            if irregular:
+                for (match_id,) in conn.execute(
+                    "SELECT DISTINCT match_id FROM matchups WHERE match_id >= ? AND match_id < ?", (platform + '_', platform + '`')
+                ):
+                    key_platform, key = _split(match_id)
+                    if key_platform is None or key == 0:
+                        seen.add(match_id)
+            # Distinct IDs map to distinct numbers, so an in-place sort is enough
+            numbers = np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int64)
+            del chunks
+            numbers.sort()
+            seen._sorted[platform] = numbers
+        return seen
+
+    def __contains__(self, match_id):
+        platform, key = _split(match_id)
+        if platform is None:
+            return key in self._other
+        if key in self._recent.get(platform, ()):
+            return True
+        array = self._sorted.get(platform)
+        if array is None or not len(array):
+            return False
+        index = np.searchsorted(array, key)
+        return index < len(array) and array[index] == key
+
+    def __len__(self):
+        return sum(len(array) for array in self._sorted.values()) + self._recent_count + len(self._other)
+
+    def add(self, match_id):
+        if match_id in self:
+            return
+        platform, key = _split(match_id)
+        if platform is None:
+            self._other.add(key)
+            return
+        self._recent.setdefault(platform, set()).add(key)
+        self._recent_count += 1
+        if self._recent_count >= MERGE_THRESHOLD:
+            self._merge()
+
+    def discard(self, match_id):
+        platform, key = _split(match_id)
+        if platform is None:
+            self._other.discard(key)
+        elif key in self._recent.get(platform, ()):
+            self._recent[platform].discard(key)
+            self._recent_count -= 1
+        elif match_id in self:
+            array = self._sorted[platform]
+            self._sorted[platform] = np.delete(array, np.searchsorted(array, key))
+
+    def _merge(self):
+        for platform, keys in self._recent.items():
+            added = np.fromiter(keys, dtype=np.int64, count=len(keys))
+            self._sorted[platform] = np.union1d(self._sorted.get(platform, np.empty(0, dtype=np.int64)), added)
+        self._recent = {}
+        self._recent_count = 0
+
+    def nbytes(self):
+        """Approximate memory held by the sorted arrays."""
+        return sum(array.nbytes for array in self._sorted.values())
@@ -1,22 +1,31 @@
 import sys
+import threading
+import time
+from contextlib import asynccontextmanager
 from pathlib import Path
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from pydantic import BaseModel
-from typing import Union, Dict
+from typing import Union, Dict, List
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import json
-import os
 
 # Add the project root (two levels up) to sys.path
 current_dir = Path(__file__).resolve().parent
 project_root = current_dir.parent.parent  # Navigate to project/
 sys.path.append(str(project_root))
 
-from match_data_analyzer import MatchDataAnalyzer
-from config import DB_PATH
+from match_data_analyzer import BUILD_MIN_MATCHES, MatchDataAnalyzer
+from champion_catalog import ChampionCatalog
+from metrics import metrics
+from config import DB_PATH, CACHE_POLL_SECONDS, CACHE_REFRESH_SECONDS
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    if cache_state['status'] != 'fresh':
+        start_background_refresh()
+    threading.Thread(target=watch_published_caches, daemon=True).start()
+    yield
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -26,81 +35,178 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-CHAMPION_DATA_URL = os.path.join(BASE_DIR, '../../static_data/champions.json')
+@app.middleware('http')
+async def record_request_metrics(request: Request, call_next):
+    """Time every request into http_request_seconds, labelled by route template to bound the series."""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get('route')
+        metrics.observe(
+            'http_request_seconds', time.perf_counter() - start,
+            route=route.path if route is not None else 'unmatched', method=request.method, status=status
+        )
+
+# Champion data is static: load it once and serve pre-encoded bytes
+try:
+    champion_catalog = ChampionCatalog.load()
+except FileNotFoundError as e:
+    print(f"Champion catalog not found: {e}")
+    champion_catalog = None
+
+# Serve the persisted caches right away; stale ones are refreshed in the background
+analyzer = MatchDataAnalyzer(db_path=DB_PATH, refresh=False, read_only=True)
+_status = analyzer.cache_status()
+cache_state = {
+    'status': 'fresh' if _status['fresh'] else 'stale',
+    'cached_rowid': _status['cached_rowid'],
+    'current_rowid': _status['current_rowid'],
+    'refreshed_at': None
+}
+_refresh_lock = threading.Lock()
+_refresh_started = {'at': None}
 
-# Debug: Print the resolved path
-print(f"BASE_DIR: {BASE_DIR}")
-print(f"CHAMPION_DATA_URL: {CHAMPION_DATA_URL}")
-print(f"File exists: {os.path.exists(CHAMPION_DATA_URL)}")
+def update_cache_state():
+    """Re-read how far the served caches lag behind matchups (one MAX(rowid) lookup) into cache_state."""
+    status = analyzer.cache_status()
+    cache_state.update(cached_rowid=status['cached_rowid'], current_rowid=status['current_rowid'])
+    # A running refresh reports its own outcome once the new caches are swapped in
+    if cache_state['status'] != 'refreshing':
+        if status['fresh']:
+            cache_state['status'] = 'fresh'
+        elif cache_state['status'] == 'fresh':
+            cache_state['status'] = 'stale'
+    return cache_state['status']
+
+def start_background_refresh():
+    """Start refresh_caches_in_background unless one is already running; False if one is."""
+    with _refresh_lock:
+        if cache_state['status'] == 'refreshing':
+            return False
+        cache_state['status'] = 'refreshing'
+        _refresh_started['at'] = time.time()
+    threading.Thread(target=refresh_caches_in_background, daemon=True).start()
+    return True
+
+def refresh_caches_in_background():
+    """Refresh the caches on a separate analyzer and connection, then swap them into the serving one."""
+    try:
+        refreshed = MatchDataAnalyzer(db_path=DB_PATH)
+        analyzer.adopt_caches(refreshed)
+        status = refreshed.cache_status()
+        cache_state.update(
+            status='fresh', cached_rowid=status['cached_rowid'], current_rowid=status['current_rowid'], refreshed_at=time.time()
+        )
+    except Exception as e:
+        print(f"Background cache refresh failed: {e}")
+        cache_state['status'] = 'failed'
 
-# Initialize MatchDataAnalyzer
-analyzer = MatchDataAnalyzer(db_path=DB_PATH)
+def watch_published_caches():
+    """Pick up win rate matrices published by other workers or by a rebuild outside the API, and
+    refresh in the background (at most every CACHE_REFRESH_SECONDS) once matchups grows past the caches."""
+    while True:
+        time.sleep(CACHE_POLL_SECONDS)
+        try:
+            if analyzer.reload_published_caches():
+                cache_state['refreshed_at'] = time.time()
+            started = _refresh_started['at']
+            if update_cache_state() in ('stale', 'failed') and (started is None or time.time() - started >= CACHE_REFRESH_SECONDS):
+                start_background_refresh()
+        except Exception as e:
+            print(f"Reloading published caches failed: {e}")
 
 # Pydantic models for request validation
+# window limits win rates to recent data: 'patches:N', 'days:N', 'half_life:D' or 'all' (the default)
 class TeamRequest(BaseModel):
     blue_team: Dict[str, Union[str, None]]
     red_team: Dict[str, Union[str, None]]
+    window: Union[str, None] = None
 
 class AllyRequest(BaseModel):
     champion: str
     enemy_champion: str
     lane: str
+    window: Union[str, None] = None
+
+class PickRequest(BaseModel):
+    blue_team: Dict[str, Union[str, None]]
+    red_team: Dict[str, Union[str, None]]
+    role: str
+    side: str = 'blue'
+    k: int = 5
+    two_ply: bool = False
+    window: Union[str, None] = None
+    lower_bound: bool = False  # Rank by the confidence interval's lower bound instead of the win rate
+
+class BuildRequest(BaseModel):
+    champion: str
+    lane: str
+    enemy_champion: Union[str, None] = None
+    k: int = 5
+    min_matches: int = BUILD_MIN_MATCHES
 
 @app.get('/')
 def homepage():
     return {'message': 'Welcome to League of Legends Prediction Tool'}
 
+@app.get('/ready')
+def ready():
+    """Readiness probe: the analyzer serves as soon as it is loaded; cache reports how fresh it is."""
+    update_cache_state()
+    return {'ready': True, 'cache': dict(cache_state)}
+
+@app.get('/cache/stats')
+async def response_cache_stats():
+    """Hit/miss counters of the prediction and matchup response cache, for sizing it."""
+    return analyzer.response_cache.stats()
+
+@app.get('/metrics')
+def prometheus_metrics():
+    """Request, cache build and response cache metrics in the Prometheus text format.
+
+    The response cache counts its hits, misses and evictions as counters as they happen; only its
+    current size, settings and hit rate are exported here as gauges.
+    """
+    for name, value in analyzer.response_cache.stats().items():
+        if name not in ('hits', 'misses', 'evictions') and isinstance(value, (int, float)):
+            metrics.set(f'response_cache_{name}', value)
+    metrics.set('analyzer_cache_fresh', 1 if update_cache_state() == 'fresh' else 0)
+    return Response(metrics.render(), media_type='text/plain; version=0.0.4; charset=utf-8')
+
 @app.get('/greet/{name}')
 async def greet(name: str):
     greeting = f'Hello, {name}. This is a personalized greeting!'
     return {'message': greeting}
 
 @app.get('/champions')
-async def get_champions():
-    try:
-        print(f"Attempting to read file: {CHAMPION_DATA_URL}")
-        with open(CHAMPION_DATA_URL, 'r', encoding='utf-8') as file:
-            champion_data = json.load(file)
-        print("File read successfully")
-        return JSONResponse(content=champion_data)
-    except FileNotFoundError as e:
-        print(f"FileNotFoundError: {e}")
+async def get_champions(request: Request):
+    if champion_catalog is None:
         raise HTTPException(status_code=404, detail="Champions file not found")
-    except json.JSONDecodeError as e:
-        print(f"JSONDecodeError: {e}")
-        raise HTTPException(status_code=500, detail="Error decoding champions JSON data")
-    except Exception as e:
-        print(f"Unexpected error: {e}")
-        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+    headers = {'ETag': champion_catalog.etag, 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+    if_none_match = request.headers.get('if-none-match', '')
+    if champion_catalog.etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+        return Response(status_code=304, headers=headers)
+    if 'gzip' in request.headers.get('accept-encoding', ''):
+        return Response(champion_catalog.gzip_body, media_type='application/json', headers={**headers, 'Content-Encoding': 'gzip'})
+    return Response(champion_catalog.body, media_type='application/json', headers=headers)
 
 @app.get('/champions/{champion_name}')
 async def get_champion(champion_name: str):
-    try:
-        with open(CHAMPION_DATA_URL, 'r', encoding='utf-8') as file:
-            champion_data = json.load(file)
-        
-        query = champion_name.lower()
-        matches = []
-        if "data" in champion_data:
-            for champ_key, champ_data in champion_data["data"].items():
-                champ_name = champ_data.get("name", champ_key).lower()
-                if query in champ_name or query in champ_key.lower():
-                    matches.append([champ_name, champ_data])
-        
-        if matches:
-            return JSONResponse(content=matches)
-        else:
-            raise HTTPException(status_code=404, detail="No champions found")
-    except FileNotFoundError:
+    if champion_catalog is None:
         raise HTTPException(status_code=404, detail="Champions file not found")
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=500, detail="Error decoding champions JSON data")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+    body = champion_catalog.search(champion_name)
+    if body is None:
+        raise HTTPException(status_code=404, detail="No champions found")
+    return Response(body, media_type='application/json')
 
+# Analyzer endpoints are plain def: FastAPI runs them in its threadpool, so lookups never block the
+# event loop, and the analyzer hands each thread its own read-only sqlite3 connection if it needs one
 @app.post('/predict_team_win_rate')
-async def predict_team_win_rate(request: TeamRequest):
+def predict_team_win_rate(request: TeamRequest):
     try:
         lanes = ['TOP', 'JUNGLE', 'MIDDLE', 'BOTTOM', 'UTILITY']
         blue_team = [request.blue_team.get(role, None) for role in ['Top', 'Jungle', 'Mid', 'Bottom', 'Support']]
@@ -115,24 +221,91 @@ async def predict_team_win_rate(request: TeamRequest):
         blue_team_full = blue_team + [None] * (5 - len(blue_team))
         red_team_full = red_team + [None] * (5 - len(red_team))
 
-        win_rate = analyzer.estimate_team_win_rate(blue_team_full, red_team_full, lanes)
-        return {'win_rate': win_rate, 'message': 'Win rate prediction successful'}
+        estimate = analyzer.estimate_team_win_rate(blue_team_full, red_team_full, lanes, request.window, interval=True)
+        return {**estimate, 'message': 'Win rate prediction successful'}
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error predicting win rate: {str(e)}")
 
+@app.post('/predict_team_win_rate/batch')
+def predict_team_win_rate_batch(requests: List[TeamRequest]):
+    try:
+        lanes = ['TOP', 'JUNGLE', 'MIDDLE', 'BOTTOM', 'UTILITY']
+        roles = ['Top', 'Jungle', 'Mid', 'Bottom', 'Support']
+        blue_teams = [[request.blue_team.get(role, None) for role in roles] for request in requests]
+        red_teams = [[request.red_team.get(role, None) for role in roles] for request in requests]
+
+        # One vectorized pass per distinct window
+        estimates = [None] * len(requests)
+        for window in {request.window for request in requests}:
+            positions = [i for i, request in enumerate(requests) if request.window == window]
+            rates, lows, highs = analyzer.estimate_team_win_rates(
+                [blue_teams[i] for i in positions], [red_teams[i] for i in positions], lanes, window, interval=True
+            )
+            for i, rate, low, high in zip(positions, rates.tolist(), lows.tolist(), highs.tolist()):
+                estimates[i] = {'win_rate': rate, 'win_rate_low': low, 'win_rate_high': high}
+
+        predictions = []
+        for blue_team, red_team, estimate in zip(blue_teams, red_teams, estimates):
+            if not any(blue_team) or not any(red_team):
+                predictions.append({'win_rate': 50.0, 'message': 'Not enough champions selected to predict win rate'})
+            else:
+                predictions.append({**estimate, 'message': 'Win rate prediction successful'})
+        return {'predictions': predictions}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error predicting win rates: {str(e)}")
+
 @app.post('/suggest_allies')
-async def suggest_allies(request: AllyRequest):
+def suggest_allies(request: AllyRequest):
     try:
         matchup_analysis = analyzer.analyze_champion_matchup(
-            request.champion, request.enemy_champion, request.lane
+            request.champion, request.enemy_champion, request.lane, request.window
         )
         return {
             'my_champion': matchup_analysis['my_champion'],
             'enemy_champion': matchup_analysis['enemy_champion'],
             'lane': matchup_analysis['lane'],
             'win_rate': matchup_analysis['win_rate'],
+            'win_rate_low': matchup_analysis['win_rate_low'],
+            'win_rate_high': matchup_analysis['win_rate_high'],
             'matches_analyzed': matchup_analysis['matches_analyzed'],
             'suggested_allies': matchup_analysis['suggested_allies']
         }
     except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Error suggesting allies: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=f"Error suggesting allies: {str(e)}")
+
+@app.post('/recommend_picks')
+def recommend_picks(request: PickRequest):
+    roles = ['Top', 'Jungle', 'Mid', 'Bottom', 'Support']
+    lanes = ['TOP', 'JUNGLE', 'MIDDLE', 'BOTTOM', 'UTILITY']
+    if request.role not in roles:
+        raise HTTPException(status_code=400, detail=f"Unknown role {request.role!r}, expected one of {roles}")
+    if request.side not in ('blue', 'red'):
+        raise HTTPException(status_code=400, detail="side must be 'blue' or 'red'")
+    if not 1 <= request.k <= 50:
+        raise HTTPException(status_code=400, detail="k must be between 1 and 50")
+    try:
+        blue_team = [request.blue_team.get(role, None) for role in roles]
+        red_team = [request.red_team.get(role, None) for role in roles]
+        my_team, enemy_team = (blue_team, red_team) if request.side == 'blue' else (red_team, blue_team)
+        picks = analyzer.recommend_picks(
+            my_team, enemy_team, lanes[roles.index(request.role)], request.k, request.two_ply, lanes, request.window, request.lower_bound
+        )
+        return {'role': request.role, 'side': request.side, 'picks': picks}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error recommending picks: {str(e)}")
+
+@app.post('/recommend_builds')
+def recommend_builds(request: BuildRequest):
+    """Top items, keystones, rune pages and summoner spells for a champion in a lane, with the matchup
+    win rate when enemy_champion is given. Builds are counted per champion and lane, not per opponent."""
+    if not 1 <= request.k <= 50:
+        raise HTTPException(status_code=400, detail="k must be between 1 and 50")
+    try:
+        builds = analyzer.top_builds(request.champion, request.lane, request.k, request.min_matches)
+        response = {'champion': request.champion, 'lane': request.lane, 'builds': builds}
+        if request.enemy_champion:
+            matchup = analyzer.analyze_champion_matchup(request.champion, request.enemy_champion, request.lane)
+            response.update({key: matchup[key] for key in ('enemy_champion', 'win_rate', 'win_rate_low', 'win_rate_high', 'matches_analyzed')})
+        return response
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error recommending builds: {str(e)}")
@@ -0,0 +1,43 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import RANKED_SOLO_DUO_QUEUE_ID
+
+LANES = ['TOP', 'JUNGLE', 'MIDDLE', 'BOTTOM', 'UTILITY']
+
+def _match_payload(puuids, game_creation=1_700_000_000_000):
+    """A minimal ranked match payload that process_match_details accepts; the first five PUUIDs win."""
+    participants = [{
+        'individualPosition': LANES[i % 5],
+        'puuid': puuid,
+        'championName': f'Champion{i}',
+        'win': i < 5,
+        'teamId': 100 if i < 5 else 200,
+        'perks': {
+            'styles': [
+                {'style': 8000, 'selections': [{'perk': 8005}, {'perk': 9111}, {'perk': 9104}, {'perk': 8299}]},
+                {'style': 8400, 'selections': [{'perk': 8444}, {'perk': 8451}]}
+            ],
+            'statPerks': {'defense': 5002, 'flex': 5008, 'offense': 5005}
+        },
+        **{f'item{slot}': 3000 + slot for slot in range(6)},
+        'summoner1Id': 4,
+        'summoner2Id': 14
+    } for i, puuid in enumerate(puuids)]
+    return {'info': {
+        'queueId': RANKED_SOLO_DUO_QUEUE_ID,
+        'gameDuration': 1800,
+        'gameVersion': '14.3.558.1234',
+        'gameCreation': game_creation,
+        'participants': participants,
+        'teams': [{'teamId': 100, 'bans': []}, {'teamId': 200, 'bans': []}]
+    }}
+
+@pytest.fixture
+def match_payload():
+    """Factory for minimal ranked match payloads: match_payload(puuids, game_creation=...)."""
+    return _match_payload
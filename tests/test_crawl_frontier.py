@@ -0,0 +1,66 @@
+import asyncio
+import sqlite3
+
+import httpx
+
+import extract_data
+from async_crawler import AsyncMatchCrawler, AsyncRiotClient
+from crawl_frontier import CrawlFrontier
+from database import setup_database
+
+PLAYERS = [f'player-{i}' for i in range(10)]
+FAILING = {'player-0': 503, 'player-1': 503, 'player-2': 429, 'player-3': 429}
+
+def _riot_api(match):
+    """Mock Riot API: the seed's one match brings in ten players, four of whose match-ID lookups fail."""
+    def handle(request):
+        path = request.url.path
+        if path.endswith('/matches/NA1_1'):
+            return httpx.Response(200, json=match)
+        puuid = path.split('/by-puuid/')[1].split('/')[0]
+        if puuid == 'seed':
+            return httpx.Response(200, json=['NA1_1'])
+        if puuid in FAILING:
+            return httpx.Response(FAILING[puuid], headers={'Retry-After': '0'})
+        return httpx.Response(200, json=[])
+    return handle
+
+def _statuses(db_path):
+    conn = sqlite3.connect(db_path)
+    statuses = dict(conn.execute("SELECT puuid, status FROM crawl_frontier"))
+    conn.close()
+    return statuses
+
+def test_async_crawl_keeps_puuids_whose_match_ids_failed_pending(tmp_path, match_payload):
+    async def crawl():
+        async with AsyncRiotClient(base_url='https://riot.test', headers={}, concurrency=4, retries=1) as client:
+            await client.client.aclose()
+            client.client = httpx.AsyncClient(base_url='https://riot.test', transport=httpx.MockTransport(_riot_api(match_payload(PLAYERS))))
+            crawler = AsyncMatchCrawler(
+                client, db_path=tmp_path / 'matchups.db', concurrency=4,
+                archive_path=tmp_path / 'archive.bin', stats_path=tmp_path / 'stats.json'
+            )
+            return await crawler.run(seed_puuid='seed')
+
+    assert asyncio.run(crawl()) == 1
+    statuses = _statuses(tmp_path / 'matchups.db')
+    assert {puuid for puuid, status in statuses.items() if status == 'pending'} == set(FAILING)
+    assert {puuid for puuid, status in statuses.items() if status == 'done'} == {'seed'} | set(PLAYERS) - set(FAILING)
+
+def test_sync_crawl_releases_puuid_whose_match_ids_failed(tmp_path, monkeypatch):
+    db_path = tmp_path / 'matchups.db'
+    setup_database(db_path)
+    conn = sqlite3.connect(db_path)
+    frontier = CrawlFrontier(conn)
+    frontier.add(['failing', 'empty'])
+
+    monkeypatch.setattr(extract_data, 'get_match_ids', lambda puuid: None if puuid == 'failing' else [])
+    for _ in range(2):
+        puuid = frontier.claim()
+        extract_data.extract_matches_data(puuid, set(), db_path, frontier=frontier)
+    conn.commit()
+
+    # The failed PUUID is not claimed again in this crawl, but stays pending for the next one
+    assert frontier.claim() is None
+    assert _statuses(db_path) == {'failing': 'pending', 'empty': 'done'}
+    assert CrawlFrontier(conn).claim() == 'failing'
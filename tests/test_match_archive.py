@@ -0,0 +1,30 @@
+import sqlite3
+
+from match_archive import MatchArchive, load_payload, replay_archive
+
+def test_reopen_after_crash_tail_appends_at_the_cut(tmp_path, match_payload):
+    def payload(match_number):
+        return match_payload([f'puuid-{match_number}-{i}' for i in range(10)], game_creation=1_700_000_000_000 + match_number)
+
+    archive_path = tmp_path / 'archive.bin'
+    with MatchArchive(archive_path) as archive:
+        archive.append('NA1_1', payload(1))
+        archive.append('NA1_2', payload(2))
+
+    # A crash between writing a frame and committing its index entry leaves a half-written tail
+    committed_size = archive_path.stat().st_size
+    with open(archive_path, 'ab') as file:
+        file.write(b'\x78\x9c half-written frame')
+
+    with MatchArchive(archive_path) as archive:
+        assert archive.offset == committed_size
+        archive.append('NA1_3', payload(3))
+
+    for match_number in (1, 2, 3):
+        assert load_payload(f'NA1_{match_number}', archive_path) == payload(match_number)
+
+    db_path = tmp_path / 'matchups.db'
+    assert replay_archive(archive_path, db_path, processes=1) == 3
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(DISTINCT match_id), COUNT(*) FROM matchups").fetchone() == (3, 30)
+    conn.close()
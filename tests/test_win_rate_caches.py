@@ -0,0 +1,35 @@
+import sqlite3
+
+import pandas as pd
+
+from benchmark import build_synthetic_db
+from match_data_analyzer import MatchDataAnalyzer
+
+def _win_rates(analyzer):
+    frame = pd.read_sql_query("SELECT champion, opponent, lane, wins, total_matches, win_rate FROM win_rates", analyzer.conn)
+    return frame.sort_values(['champion', 'opponent', 'lane'], na_position='first').reset_index(drop=True)
+
+def test_incremental_update_matches_full_rebuild(tmp_path):
+    full_path = build_synthetic_db(tmp_path / 'full.db', 400)
+    partial_path = tmp_path / 'partial.db'
+    partial_path.write_bytes(full_path.read_bytes())
+    conn = sqlite3.connect(partial_path)
+    conn.execute("DELETE FROM matchups WHERE rowid > 2000")
+    conn.commit()
+    conn.close()
+
+    analyzer = MatchDataAnalyzer(partial_path)
+    # The crawler adds the remaining matches; the next refresh folds them in incrementally
+    conn = sqlite3.connect(partial_path)
+    conn.execute("ATTACH DATABASE ? AS full", (str(full_path),))
+    conn.execute("INSERT INTO matchups SELECT * FROM full.matchups WHERE rowid > 2000 ORDER BY rowid")
+    conn.commit()
+    conn.close()
+    analyzer.refresh_caches()
+    rebuilt = MatchDataAnalyzer(full_path)
+
+    incremental, expected = _win_rates(analyzer), _win_rates(rebuilt)
+    assert (incremental['total_matches'] > 0).all()
+    pd.testing.assert_frame_equal(incremental, expected)
+    analyzer.close()
+    rebuilt.close()
@@ -0,0 +1,62 @@
+from statistics import NormalDist
+import numpy as np
+
+INTERVAL_METHODS = ('wilson', 'bootstrap')
+CONFIDENCE_LEVEL = 0.95
+Z = NormalDist().inv_cdf(0.5 + CONFIDENCE_LEVEL / 2)  # 1.96 for 95%
+BOOTSTRAP_RESAMPLES = 200
+BOOTSTRAP_SEED = 0
+BOOTSTRAP_CHUNK_DRAWS = 1 << 24  # keys x resamples drawn at a time, bounding memory to a few hundred MB
+
+def wilson_interval(wins, total, prior_weight, prior_rate):
+    """CONFIDENCE_LEVEL Wilson score interval, in percent, of the prior-smoothed rates of many keys at once.
+
+    The frequentist score interval is applied to the smoothed counts: the prior counts as
+    prior_weight extra games won at prior_rate, so the interval surrounds the smoothed win rate
+    and a key with no games gets the prior's own interval. Counts may be fractional (decayed
+    windows).
+    """
+    total = np.asarray(total, dtype=np.float64) + prior_weight
+    rate = (np.asarray(wins, dtype=np.float64) + prior_weight * prior_rate) / total
+    z2 = Z * Z
+    center = (rate + z2 / (2 * total)) / (1 + z2 / total)
+    half = Z / (1 + z2 / total) * np.sqrt(rate * (1 - rate) / total + z2 / (4 * total * total))
+    return (center - half) * 100, (center + half) * 100
+
+def bootstrap_interval(wins, total, prior_weight, prior_rate, resamples=BOOTSTRAP_RESAMPLES, seed=BOOTSTRAP_SEED):
+    """Bayesian bootstrap interval, in percent, of the prior-smoothed rates of many keys at once.
+
+    Each resample draws a key's win rate from its Beta(wins + prior wins, losses + prior losses)
+    posterior, whose mean is the smoothed rate. Resampling games at the raw rate instead would
+    give unanimous keys (10/10, 0/5) a zero-width interval. Keys are drawn in blocks as
+    (keys, resamples) arrays and the interval bounds are the blocks' quantiles along the
+    resample axis.
+    """
+    wins = np.asarray(wins, dtype=np.float64)
+    total = np.asarray(total, dtype=np.float64)
+    alpha = wins + prior_weight * prior_rate
+    beta = total - wins + prior_weight * (1 - prior_rate)
+    rng = np.random.default_rng(seed)
+    low, high = np.empty(len(total)), np.empty(len(total))
+    step = max(1, BOOTSTRAP_CHUNK_DRAWS // resamples)
+    quantiles = [(1 - CONFIDENCE_LEVEL) / 2, (1 + CONFIDENCE_LEVEL) / 2]
+    for start in range(0, len(total), step):
+        block = slice(start, start + step)
+        rates = rng.beta(alpha[block, None], beta[block, None], size=(len(total[block]), resamples)) * 100
+        low[block], high[block] = np.quantile(rates, quantiles, axis=1)
+    return low, high
+
+def win_rate_interval(wins, total, prior_weight, prior_rate, method='wilson'):
+    """Dispatch to the interval method named in INTERVAL_METHODS."""
+    if method == 'wilson':
+        return wilson_interval(wins, total, prior_weight, prior_rate)
+    if method == 'bootstrap':
+        return bootstrap_interval(wins, total, prior_weight, prior_rate)
+    raise ValueError(f"Unknown interval method {method!r}, expected one of {INTERVAL_METHODS}")
+
+def interval_sd(low, high):
+    """Standard error, in percent, implied by an interval's width; combined across lanes as independent.
+
+    Computed in float64 (the stored bounds are float32) so it agrees with the same sum in Python floats.
+    """
+    return (np.asarray(high, dtype=np.float64) - np.asarray(low, dtype=np.float64)) / (2 * Z)
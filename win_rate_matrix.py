@@ -0,0 +1,94 @@
+import json
+import mmap
+import os
+import struct
+import numpy as np
+
+MAGIC = b'WRMX'
+FORMAT_VERSION = 2  # 2 added the win_rate_low/win_rate_high interval arrays
+ALIGNMENT = 64  # arrays start on aligned offsets so the mapped views are aligned too
+_PREAMBLE = struct.Struct('<4sII')  # magic, format version, header length
+ARRAYS = [('wins', np.int32), ('total', np.int32), ('win_rate', np.float32), ('win_rate_low', np.float32), ('win_rate_high', np.float32)]
+
+def matrix_path(db_path):
+    """Artifact written next to the database, e.g. data/ranked_solo_duo_matchups.winrates.bin."""
+    return db_path.with_suffix('.winrates.bin')
+
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+def write_matrix(path, champions, lanes, arrays, generation, matchups_rowid):
+    """Write the win rate arrays as a versioned artifact, replacing any previous one atomically; True if published.
+
+    The file is written under a temporary name, fsynced and renamed over path, so readers either
+    keep mapping the old inode or open the complete new one; never a partial file. Windows refuses
+    to replace a file that any process still maps: the temporary file is then removed and False
+    returned, leaving the old artifact, whose generation no longer matches the database's.
+    """
+    shape = arrays['win_rate'].shape
+    header = {
+        'generation': generation,
+        'matchups_rowid': matchups_rowid,
+        'champions': champions,
+        'lanes': lanes,
+        'shape': list(shape),
+        'arrays': {}
+    }
+    # Offsets are relative to the aligned end of the header
+    offset = 0
+    for name, dtype in ARRAYS:
+        header['arrays'][name] = {'dtype': np.dtype(dtype).str, 'offset': offset}
+        offset = _aligned(offset + int(np.prod(shape)) * np.dtype(dtype).itemsize)
+    encoded = json.dumps(header).encode('utf-8')
+    data_start = _aligned(_PREAMBLE.size + len(encoded))
+
+    temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(temporary, 'wb') as file:
+        file.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(encoded)))
+        file.write(encoded)
+        for name, dtype in ARRAYS:
+            file.seek(data_start + header['arrays'][name]['offset'])
+            file.write(np.ascontiguousarray(arrays[name], dtype=dtype).tobytes())
+        file.truncate(data_start + offset)
+        file.flush()
+        os.fsync(file.fileno())
+    try:
+        os.replace(temporary, path)
+    except PermissionError:
+        os.remove(temporary)
+        return False
+    return True
+
+def read_matrix(path):
+    """Map an artifact read-only and return (header, {name: array view}), or None if there is none.
+
+    The views share the page cache with every other process mapping the same file.
+    """
+    try:
+        file = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+    with file:
+        signature = os.fstat(file.fileno())
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, header_length = _PREAMBLE.unpack_from(mapped)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        mapped.close()
+        return None
+    header = json.loads(mapped[_PREAMBLE.size:_PREAMBLE.size + header_length])
+    header['signature'] = (signature.st_ino, signature.st_mtime_ns)
+    shape = tuple(header['shape'])
+    data_start = _aligned(_PREAMBLE.size + header_length)
+    arrays = {
+        name: np.frombuffer(mapped, dtype=spec['dtype'], count=int(np.prod(shape)), offset=data_start + spec['offset']).reshape(shape)
+        for name, spec in header['arrays'].items()
+    }
+    return header, arrays
+
+def matrix_signature(path):
+    """(inode, mtime) of the current artifact, to detect a newly published one; None if missing."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns